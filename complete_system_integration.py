@@ -5,14 +5,17 @@ Fixed syntax error in class definition
 """
 
 import asyncio
-import schedule
-import time
+import signal
 import logging
-from datetime import datetime, timedelta
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from typing import Dict, List, Optional
-import json
 import os
-from dataclasses import dataclass
+import sqlite3
+from dataclasses import dataclass, field
 
 # Import our custom modules
 from factor_data_collection import FactorDataCollector
@@ -20,7 +23,74 @@ from email_alert_system import FactorAlertSystem, EmailConfig
 from record_keeping_system import FactorRecordKeeping, FactorRecordIntegration
 from performance_attribution_system import PerformanceAttributionSystem
 
-@dataclass
+# Notification email bodies (only the substitution happens per send)
+_ERR_TMPL = "<html><body><h2>System Error</h2><p>{msg}</p><p>Time: {ts}</p></body></html>"
+_STARTUP_TMPL = "<html><body><h2>System Startup</h2><p>Factor Monitoring System started successfully at {ts}</p></body></html>"
+_SHUTDOWN_TMPL = "<html><body><h2>System Shutdown</h2><p>System shutdown at {ts}</p></body></html>"
+
+# Factor name -> ETF symbol
+FACTOR_SYMBOL_MAP = {
+    'Value': 'VTV',
+    'Growth': 'VUG',
+    'Quality': 'QUAL',
+    'Momentum': 'MTUM',
+    'Low_Volatility': 'USMV',
+    'Size': 'VB'
+}
+
+# Default target factor allocations
+DEFAULT_TARGET_ALLOCATIONS = {
+    'Value': 0.30,
+    'Growth': 0.20,
+    'Quality': 0.20,
+    'Low_Volatility': 0.15,
+    'Momentum': 0.10,
+    'Size': 0.05
+}
+
+# Scheduling is anchored to exchange time so it follows US DST changes
+NY_TZ = ZoneInfo("America/New_York")
+
+# SystemConfig field -> (environment variables, first one set wins; type)
+_ENV_FIELDS = {
+    'db_path': (('DB_PATH',), str),
+    'email_sender': (('FACTOR_EMAIL',), str),
+    'email_password': (('FACTOR_EMAIL_PASSWORD',), str),
+    'schwab_client_id': (('SCHWAB_CLIENT_ID', 'TOS_CLIENT_ID'), str),
+    'schwab_refresh_token': (('SCHWAB_REFRESH_TOKEN', 'TOS_REFRESH_TOKEN'), str),
+    'schwab_account_id': (('SCHWAB_ACCOUNT_ID', 'TOS_ACCOUNT_ID'), str),
+    'portfolio_value': (('PORTFOLIO_VALUE',), float),
+    'max_daily_trades': (('MAX_DAILY_TRADES',), int),
+    'max_position_drift': (('MAX_POSITION_DRIFT',), float),
+    'max_single_trade_pct': (('MAX_SINGLE_TRADE_PCT',), float),
+}
+
+def next_run_time(hour, minute, now=None):
+    """Next New York wall-clock hh:mm, as an aware UTC datetime"""
+    now = now or datetime.now(timezone.utc)
+    local_now = now.astimezone(NY_TZ)
+    next_run = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    
+    if next_run <= local_now:
+        next_run = (next_run + timedelta(days=1)).replace(hour=hour, minute=minute)
+    
+    return next_run.astimezone(timezone.utc)
+
+async def _sleep_until_next(hour, minute):
+    """Sleep until the next New York wall-clock hh:mm"""
+    next_run = next_run_time(hour, minute)
+    logging.getLogger('FactorSystem').info(f"Next daily routine scheduled for {next_run.astimezone(NY_TZ)}")
+    await asyncio.sleep((next_run - datetime.now(timezone.utc)).total_seconds())
+
+def _drift_trades(current, target, total_value, thr):
+    """Indices of factors drifting past thr and their trade values"""
+    drift = np.abs(current - target)
+    idx = np.nonzero(drift > thr)[0]
+    # Difference of dollar values: 1e6 * (0.1 - 0.3) is -199999.99..., one share short once truncated
+    trade_values = total_value * target[idx] - total_value * current[idx]
+    return idx, trade_values
+
+@dataclass(slots=True, frozen=True)
 class SystemConfig:
     """Complete system configuration"""
     # Database settings
@@ -29,7 +99,7 @@ class SystemConfig:
     # Email settings
     email_sender: str = ""
     email_password: str = ""
-    email_recipients: List[str] = None
+    email_recipients: List[str] = field(default_factory=list)
     
     # Schwab API settings
     schwab_client_id: str = ""
@@ -38,25 +108,35 @@ class SystemConfig:
     
     # Portfolio settings
     portfolio_value: float = 1000000.0
-    target_allocations: Dict[str, float] = None
+    target_allocations: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_TARGET_ALLOCATIONS))
     
     # Risk limits
     max_daily_trades: int = 20
     max_position_drift: float = 0.05  # 5%
     max_single_trade_pct: float = 0.10  # 10%
     
-    def __post_init__(self):
-        if self.email_recipients is None:
-            self.email_recipients = []
-        if self.target_allocations is None:
-            self.target_allocations = {
-                'Value': 0.30,
-                'Growth': 0.20,
-                'Quality': 0.20,
-                'Low_Volatility': 0.15,
-                'Momentum': 0.10,
-                'Size': 0.05
-            }
+    @classmethod
+    def from_env(cls, **defaults):
+        """Build a config from environment variables; keyword arguments replace field defaults"""
+        values = dict(defaults)
+        
+        for name, (env_vars, cast) in _ENV_FIELDS.items():
+            raw = next((os.environ[v] for v in env_vars if os.environ.get(v)), None)
+            if raw is not None:
+                values[name] = cast(raw)
+        
+        recipients = os.getenv('FACTOR_RECIPIENTS')
+        if recipients is not None:
+            values['email_recipients'] = [r.strip() for r in recipients.split(',') if r.strip()]
+        
+        # TARGET_<FACTOR> overrides each target weight (e.g. TARGET_LOW_VOLATILITY)
+        targets = values.get('target_allocations', DEFAULT_TARGET_ALLOCATIONS)
+        values['target_allocations'] = {
+            factor: float(os.getenv(f"TARGET_{factor.upper()}", weight))
+            for factor, weight in targets.items()
+        }
+        
+        return cls(**values)
 
 class CompleteFactorMonitoringSystem:
     """
@@ -68,6 +148,9 @@ class CompleteFactorMonitoringSystem:
         self.config = config
         self.logger = self.setup_logging()
         
+        # One-time database setup: WAL lets readers run while the record keeper writes
+        self._probe_conn = self.setup_database(config.db_path)
+        
         # Initialize all components
         self.data_collector = FactorDataCollector(config.db_path)
         self.email_system = self.setup_email_system()
@@ -80,21 +163,47 @@ class CompleteFactorMonitoringSystem:
             self.record_keeper
         )
         
+        # Target allocations as aligned arrays for drift checks
+        self._factor_order = list(config.target_allocations)
+        self._target_arr = np.fromiter(config.target_allocations.values(), dtype=np.float64)
+        self._factor_symbols = [self.get_symbol_from_factor(f) for f in self._factor_order]
+        
+        # Memoized attribution report for the last (start, end, weights) window
+        self._weights_key = hash(frozenset(config.target_allocations.items()))
+        self._attr_cache = {}
+        
         # System status
         self.system_active = False
         self.last_rebalance_date = None
         self.daily_trade_count = 0
+        self._stop_event = None
+        self._daily_lock = asyncio.Lock()
         
+    def setup_database(self, db_path):
+        """Enable WAL mode and return a long-lived connection for health probes"""
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
     def setup_logging(self):
-        """Setup comprehensive logging system"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('factor_system.log'),
-                logging.StreamHandler()
-            ]
-        )
+        """Setup comprehensive logging system (file/console I/O on a listener thread)"""
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        
+        file_handler = RotatingFileHandler('factor_system.log', maxBytes=10_000_000, backupCount=5)
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        
+        log_queue = queue.SimpleQueue()
+        # Added alongside any handlers other modules installed on the root logger, not replacing them
+        root = logging.getLogger()
+        self._log_handler = QueueHandler(log_queue)
+        root.addHandler(self._log_handler)
+        root.setLevel(logging.INFO)
+        
+        self._log_listener = QueueListener(log_queue, file_handler, stream_handler)
+        self._log_listener.start()
         
         logger = logging.getLogger('FactorSystem')
         return logger
@@ -115,24 +224,39 @@ class CompleteFactorMonitoringSystem:
             return None
     
     async def run_daily_routine(self):
-        """Execute complete daily monitoring routine"""
+        """Execute complete daily monitoring routine (one run at a time)"""
+        if self._daily_lock.locked():
+            self.logger.warning("Daily routine already running - skipping this trigger")
+            return False
+        
+        async with self._daily_lock:
+            return await self._daily_routine()
+    
+    async def _daily_routine(self):
+        """Daily routine body; callers hold _daily_lock"""
         try:
             self.logger.info("Starting daily routine")
             
+            # One clock read per run, shared by every step
+            now = datetime.now()
+            now_iso = now.isoformat()
+            today_str = now.strftime('%Y-%m-%d')
+            start_str = (now - timedelta(days=30)).strftime('%Y-%m-%d')
+            
             # 1. Collect latest market data
-            data_results = self.data_collector.run_daily_collection()
+            data_results = await self.data_collector.run_daily_collection_async()
             if not data_results:
                 self.logger.error("Data collection failed")
                 return False
             
             # 2. Get current portfolio state (simulated for now)
-            current_positions = self.get_simulated_positions()
+            current_positions = self.get_simulated_positions(now_iso)
             
             # 3. Calculate performance attribution
-            attribution_result = self.run_performance_attribution()
+            attribution_result = self.run_performance_attribution(start_str, today_str)
             
             # 4. Check for rebalancing needs
-            rebalancing_plan = self.assess_rebalancing_needs(current_positions)
+            rebalancing_plan = self.assess_rebalancing_needs(current_positions, now_iso)
             
             # 5. Simulate trades (no actual execution)
             if rebalancing_plan['trades_needed']:
@@ -142,7 +266,8 @@ class CompleteFactorMonitoringSystem:
             
             # 6. Record all activities
             self.record_daily_activities(data_results, current_positions, 
-                                       attribution_result, rebalancing_plan, trade_results)
+                                       attribution_result, rebalancing_plan, trade_results,
+                                       today_str)
             
             # 7. Generate and send reports
             await self.send_daily_reports(data_results, attribution_result, trade_results)
@@ -155,73 +280,82 @@ class CompleteFactorMonitoringSystem:
             await self.send_error_alert(f"Daily routine failed: {str(e)}")
             return False
     
-    def get_simulated_positions(self):
+    def get_simulated_positions(self, last_updated):
         """Get simulated positions when live trading is unavailable"""
         return {
             'total_value': self.config.portfolio_value,
             'allocations': self.config.target_allocations.copy(),
             'positions': {},
             'simulated': True,
-            'last_updated': datetime.now().isoformat()
+            'last_updated': last_updated
         }
     
-    def run_performance_attribution(self):
-        """Run performance attribution analysis"""
+    def run_performance_attribution(self, start_date, end_date):
+        """Run performance attribution analysis over [start_date, end_date]"""
+        # The data version changes whenever the database does, so a same-day rerun after collection recomputes
+        cache_key = (start_date, end_date, self._weights_key, self.attribution_system.data_version())
+        if cache_key in self._attr_cache:
+            return self._attr_cache[cache_key]
+        
         try:
-            # Get last 30 days for attribution
-            end_date = datetime.now().strftime('%Y-%m-%d')
-            start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-            
             attribution_result = self.attribution_system.generate_comprehensive_attribution_report(
                 start_date=start_date,
                 end_date=end_date,
                 portfolio_weights=self.config.target_allocations
             )
             
+            # Only the latest window is ever requested again
+            self._attr_cache = {cache_key: attribution_result}
+            
             return attribution_result
             
         except Exception as e:
             self.logger.error(f"Performance attribution failed: {e}")
             return None
     
-    def assess_rebalancing_needs(self, current_positions):
+    def assess_rebalancing_needs(self, current_positions, assess_ts):
         """Assess if portfolio rebalancing is needed"""
         try:
             current_allocations = current_positions.get('allocations', {})
-            target_allocations = self.config.target_allocations
+            total_value = current_positions['total_value']
+            
+            # Drift and trade size for every factor at once
+            current_arr = np.array([current_allocations.get(f, 0.0) for f in self._factor_order], dtype=np.float64)
+            idx, trade_values = _drift_trades(
+                current_arr, self._target_arr, float(total_value), self.config.max_position_drift
+            )
+            
+            # Fast path: nothing drifted past the threshold
+            if idx.size == 0:
+                return {
+                    'trades_needed': False,
+                    'suggested_trades': [],
+                    'total_trades': 0,
+                    'estimated_cost': 0.0,
+                    'assessment_time': assess_ts
+                }
             
-            trades_needed = False
             suggested_trades = []
             
-            for factor, target_weight in target_allocations.items():
-                current_weight = current_allocations.get(factor, 0.0)
-                drift = abs(current_weight - target_weight)
-                
-                if drift > self.config.max_position_drift:
-                    trades_needed = True
-                    
-                    # Calculate trade size
-                    total_value = current_positions['total_value']
-                    target_value = total_value * target_weight
-                    current_value = total_value * current_weight
-                    trade_value = target_value - current_value
-                    
-                    symbol = self.get_symbol_from_factor(factor)
-                    if symbol:
-                        suggested_trades.append({
-                            'factor': factor,
-                            'symbol': symbol,
-                            'action': 'BUY' if trade_value > 0 else 'SELL',
-                            'value': abs(trade_value),
-                            'reason': f'Rebalance {factor}: {current_weight:.1%} → {target_weight:.1%}'
-                        })
+            for i, trade_value in zip(idx, trade_values):
+                factor = self._factor_order[i]
+                symbol = self._factor_symbols[i]
+                if symbol:
+                    trade_value = float(trade_value)
+                    suggested_trades.append({
+                        'factor': factor,
+                        'symbol': symbol,
+                        'action': 'BUY' if trade_value > 0 else 'SELL',
+                        'value': abs(trade_value),
+                        'reason': f'Rebalance {factor}: {current_arr[i]:.1%} → {self._target_arr[i]:.1%}'
+                    })
             
             rebalancing_plan = {
-                'trades_needed': trades_needed,
+                'trades_needed': True,
                 'suggested_trades': suggested_trades,
                 'total_trades': len(suggested_trades),
                 'estimated_cost': self.estimate_trading_costs(suggested_trades),
-                'assessment_time': datetime.now().isoformat()
+                'assessment_time': assess_ts
             }
             
             return rebalancing_plan
@@ -232,55 +366,43 @@ class CompleteFactorMonitoringSystem:
     
     def get_symbol_from_factor(self, factor):
         """Map factor name to ETF symbol"""
-        factor_map = {
-            'Value': 'VTV',
-            'Growth': 'VUG',
-            'Quality': 'QUAL',
-            'Momentum': 'MTUM',
-            'Low_Volatility': 'USMV',
-            'Size': 'VB'
-        }
-        return factor_map.get(factor)
+        return FACTOR_SYMBOL_MAP.get(factor)
     
     def estimate_trading_costs(self, trades):
         """Estimate transaction costs for proposed trades"""
-        total_cost = 0.0
-        
-        for trade in trades:
-            # Assume 0.5 bps spread cost
-            spread_cost = trade['value'] * 0.0005
-            total_cost += spread_cost
-        
-        return total_cost
+        # Assume 0.5 bps spread cost
+        return 0.0005 * sum(trade['value'] for trade in trades)
     
     async def simulate_rebalancing_trades(self, rebalancing_plan):
         """Simulate rebalancing trades (no actual execution)"""
         try:
             self.logger.info("SIMULATION MODE: No actual trades executed")
             
-            simulated_orders = []
-            
-            for trade in rebalancing_plan['suggested_trades']:
-                # Simulate the trade
-                estimated_price = 100.0  # Placeholder
-                quantity = int(trade['value'] / estimated_price)
-                
-                if quantity > 0:
-                    simulated_orders.append({
-                        'factor': trade['factor'],
-                        'symbol': trade['symbol'],
-                        'action': trade['action'],
-                        'quantity': quantity,
-                        'estimated_price': estimated_price,
-                        'reason': trade['reason'],
-                        'status': 'SIMULATED'
-                    })
-                    
-                    self.daily_trade_count += 1
+            trades = rebalancing_plan['suggested_trades']
+            estimated_price = 100.0  # Placeholder
+            
+            # Share quantities for the whole plan at once
+            values = np.fromiter((t['value'] for t in trades), dtype=np.float64, count=len(trades))
+            quantities = (values / estimated_price).astype(np.int64)
+            total_value_traded = float(values.sum())
+            
+            simulated_orders = [
+                {
+                    'factor': trades[i]['factor'],
+                    'symbol': trades[i]['symbol'],
+                    'action': trades[i]['action'],
+                    'quantity': int(quantities[i]),
+                    'estimated_price': estimated_price,
+                    'reason': trades[i]['reason'],
+                    'status': 'SIMULATED'
+                }
+                for i in np.flatnonzero(quantities > 0)
+            ]
+            self.daily_trade_count += len(simulated_orders)
             
             return {
                 'orders_simulated': len(simulated_orders),
-                'total_value_traded': sum([t['value'] for t in rebalancing_plan['suggested_trades']]),
+                'total_value_traded': total_value_traded,
                 'mode': 'SIMULATION',
                 'trades': simulated_orders
             }
@@ -289,7 +411,7 @@ class CompleteFactorMonitoringSystem:
             self.logger.error(f"Trade simulation failed: {e}")
             return {'error': str(e)}
     
-    def record_daily_activities(self, data_results, positions, attribution, rebalancing, trades):
+    def record_daily_activities(self, data_results, positions, attribution, rebalancing, trades, today_str):
         """Record all daily activities for compliance"""
         try:
             # Create daily portfolio snapshot
@@ -298,7 +420,7 @@ class CompleteFactorMonitoringSystem:
                 'factor_allocations': positions['allocations'],
                 'performance_metrics': attribution.risk_adjusted_metrics if attribution else {},
                 'market_conditions': {
-                    'date': datetime.now().strftime('%Y-%m-%d'),
+                    'date': today_str,
                     'alerts_generated': len(data_results.get('alerts', [])),
                     'rebalancing_executed': rebalancing['trades_needed']
                 }
@@ -341,17 +463,36 @@ class CompleteFactorMonitoringSystem:
                 await asyncio.to_thread(
                     self.email_system.send_email,
                     "🚨 Factor System Error Alert",
-                    f"<html><body><h2>System Error</h2><p>{error_message}</p><p>Time: {datetime.now()}</p></body></html>"
+                    _ERR_TMPL.format(msg=error_message, ts=datetime.now().isoformat())
                 )
         except:
             pass  # Don't let email errors crash the system
     
-    def schedule_operations(self):
-        """Schedule all automated operations"""
-        # Daily data collection at market close + 30 minutes
-        schedule.every().day.at("16:30").do(lambda: asyncio.run(self.run_daily_routine()))
+    async def _scheduler(self):
+        """Run the daily routine at market close + 30 minutes (New York time)"""
+        while self.system_active:
+            await _sleep_until_next(16, 30)
+            
+            if self.system_active:
+                await self.run_daily_routine()
+    
+    async def _signal_waiter(self):
+        """Wait until a stop is requested via signal or stop_monitoring()"""
+        loop = asyncio.get_running_loop()
+        
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop_monitoring)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on this platform (e.g. Windows)
         
-        self.logger.info("Operations scheduled successfully")
+        await self._stop_event.wait()
+    
+    def stop_monitoring(self):
+        """Request the monitoring loop to stop"""
+        self.system_active = False
+        if self._stop_event is not None:
+            self._stop_event.set()
     
     async def start_system(self):
         """Start the complete factor monitoring system"""
@@ -381,15 +522,12 @@ class CompleteFactorMonitoringSystem:
             
             self.logger.info("✅ Running in SIMULATION MODE (no live trading)")
             
-            # Schedule operations
-            self.schedule_operations()
-            
             # Send startup notification
             if self.email_system:
                 await asyncio.to_thread(
                     self.email_system.send_email,
                     "🚀 Factor Monitoring System Started",
-                    f"<html><body><h2>System Startup</h2><p>Factor Monitoring System started successfully at {datetime.now()}</p></body></html>"
+                    _STARTUP_TMPL.format(ts=datetime.now().isoformat())
                 )
             
             # Run initial data collection
@@ -409,31 +547,28 @@ class CompleteFactorMonitoringSystem:
     def test_database_connection(self):
         """Test database connectivity"""
         try:
-            import sqlite3
-            conn = sqlite3.connect(self.config.db_path)
-            conn.execute("SELECT 1")
-            conn.close()
+            self._probe_conn.execute("SELECT 1")
             return True
         except:
             return False
     
-    def run_monitoring_loop(self):
+    async def run_monitoring_loop(self):
         """Run continuous monitoring loop"""
         self.logger.info("Starting monitoring loop...")
         
+        self._stop_event = asyncio.Event()
+        scheduler = asyncio.create_task(self._scheduler())
+        
         try:
-            while self.system_active:
-                # Run scheduled tasks
-                schedule.run_pending()
-                
-                # Sleep for 1 minute
-                time.sleep(60)
-                
-        except KeyboardInterrupt:
-            self.logger.info("Shutdown requested by user")
+            await self._signal_waiter()
+            self.logger.info("Shutdown requested")
+            
+        except asyncio.CancelledError:
+            self.logger.info("Shutdown requested")
         except Exception as e:
             self.logger.error(f"Monitoring loop error: {e}")
         finally:
+            scheduler.cancel()
             self.shutdown_system()
     
     def shutdown_system(self):
@@ -447,13 +582,23 @@ class CompleteFactorMonitoringSystem:
             if self.email_system:
                 self.email_system.send_email(
                     "🛑 Factor Monitoring System Shutdown",
-                    f"<html><body><h2>System Shutdown</h2><p>System shutdown at {datetime.now()}</p></body></html>"
+                    _SHUTDOWN_TMPL.format(ts=datetime.now().isoformat())
                 )
+                self.email_system.close()
+            
+            self._probe_conn.close()
             
             self.logger.info("System shutdown complete")
             
         except Exception as e:
             self.logger.error(f"Shutdown error: {e}")
+        
+        # Last: flushes the queued shutdown messages to the file/console handlers, then detaches
+        # this instance's queue handler so later records don't pile up in a queue nobody drains
+        self._log_listener.stop()
+        logging.getLogger().removeHandler(self._log_handler)
+        for handler in self._log_listener.handlers:
+            handler.close()
 
 # Export the fixed classes
 __all__ = ['CompleteFactorMonitoringSystem', 'SystemConfig']
@@ -1,10 +1,16 @@
-import requests
+import asyncio
+import httpx
 import base64
 import time
 import logging
 from datetime import datetime
 from config import Config
 
+try:
+    import h2
+except ImportError:  # h2 is optional (httpx[http2]); fall back to HTTP/1.1
+    h2 = None
+
 class SchwabAPI:
     """Enhanced Schwab API integration for market data and portfolio execution"""
     
@@ -17,7 +23,23 @@ class SchwabAPI:
         self.base_url = Config.SCHWAB_BASE_URL
         self.logger = logging.getLogger(__name__)
         
-    def get_access_token(self):
+        # Short-lived quote cache keyed by symbol set
+        self._quote_cache = {}
+        self._quote_ttl = 5.0  # seconds
+        self._quote_locks = {}
+        
+        # Concurrent requests share a single token refresh
+        self._token_lock = asyncio.Lock()
+        
+        # One pooled client shared by every request (HTTP/2 when h2 is installed)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=h2 is not None,
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=8)
+        )
+        
+    async def get_access_token(self):
         """Get access token using refresh token"""
         url = f"{self.base_url}/v1/oauth/token"
         
@@ -39,7 +61,7 @@ class SchwabAPI:
             headers['Authorization'] = f"Basic {encoded_credentials}"
         
         try:
-            response = requests.post(url, data=token_data, headers=headers, timeout=30)
+            response = await self._client.post(url, data=token_data, headers=headers)
             if response.status_code == 200:
                 token_data = response.json()
                 self.access_token = token_data['access_token']
@@ -54,15 +76,16 @@ class SchwabAPI:
             self.logger.error(f"Token refresh error: {e}")
             return False
     
-    def _ensure_valid_token(self):
+    async def _ensure_valid_token(self):
         """Ensure we have a valid access token"""
-        if not self.access_token or not self.token_expiry or datetime.now().timestamp() > self.token_expiry:
-            return self.get_access_token()
-        return True
+        async with self._token_lock:
+            if not self.access_token or not self.token_expiry or datetime.now().timestamp() > self.token_expiry:
+                return await self.get_access_token()
+            return True
     
-    def _make_api_request(self, url, params=None):
+    async def _make_api_request(self, url, params=None):
         """Make authenticated API request"""
-        if not self._ensure_valid_token():
+        if not await self._ensure_valid_token():
             return None
         
         headers = {
@@ -71,7 +94,7 @@ class SchwabAPI:
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = await self._client.get(url, headers=headers, params=params)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -81,22 +104,47 @@ class SchwabAPI:
             self.logger.error(f"API request error: {e}")
             return None
     
-    def get_market_hours(self, markets='equity'):
+    async def get_market_hours(self, markets='equity'):
         """Get market hours for specified markets"""
         url = f"{self.base_url}/marketdata/v1/markets"
         params = {'markets': markets}
-        return self._make_api_request(url, params)
+        return await self._make_api_request(url, params)
     
-    def get_quotes(self, symbols):
-        """Get quotes for one or more symbols"""
-        if isinstance(symbols, list):
-            symbols = ','.join(symbols)
-        
-        url = f"{self.base_url}/marketdata/v1/quotes"
-        params = {'symbols': symbols}
-        return self._make_api_request(url, params)
+    async def get_quotes(self, symbols):
+        """Get quotes for one or more symbols (cached for a few seconds)"""
+        if isinstance(symbols, str):
+            symbols = symbols.split(',')
+        
+        key = frozenset(s.strip() for s in symbols if s.strip())
+        
+        cached = self._quote_cache.get(key)
+        if cached and time.monotonic() - cached[0] < self._quote_ttl:
+            return cached[1]
+        
+        # Coalesce concurrent requests for the same symbol set
+        lock = self._quote_locks.setdefault(key, asyncio.Lock())
+        
+        try:
+            async with lock:
+                cached = self._quote_cache.get(key)
+                if cached and time.monotonic() - cached[0] < self._quote_ttl:
+                    return cached[1]
+                
+                url = f"{self.base_url}/marketdata/v1/quotes"
+                params = {'symbols': ','.join(sorted(key))}
+                result = await self._make_api_request(url, params)
+                
+                if result is not None:
+                    self._quote_cache[key] = (time.monotonic(), result)
+                
+                return result
+        finally:
+            # Drop the lock once the coalesced fetch is done so the dict doesn't grow per symbol set;
+            # callers still queued on it hold their own reference and will hit the cache
+            if self._quote_locks.get(key) is lock:
+                del self._quote_locks[key]
     
-    def get_price_history(self, symbol, period_type='year', period=1, frequency_type='daily', frequency=1):
+    async def get_price_history(self, symbol, period_type='year', period=1, frequency_type='daily', frequency=1):
         """Get price history for a symbol"""
         url = f"{self.base_url}/marketdata/v1/pricehistory"
         params = {
@@ -106,39 +154,48 @@ class SchwabAPI:
             'frequencyType': frequency_type,
             'frequency': frequency
         }
-        return self._make_api_request(url, params)
-    
-    def get_movers(self, index='$DJI', direction='up', change='percent'):
+        return await self._make_api_request(url, params)
+
+    async def get_price_histories(self, symbols, max_concurrent=8, **kwargs):
+        """Get price history for many symbols concurrently (bounded for rate limits)"""
+        sem = asyncio.Semaphore(max_concurrent)
+
+        async def _one(symbol):
+            async with sem:
+                return symbol, await self.get_price_history(symbol, **kwargs)
+
+        # dict.fromkeys drops duplicate symbols but keeps their order
+        return dict(await asyncio.gather(*[_one(s) for s in dict.fromkeys(symbols)]))
+
+    async def get_movers(self, index='$DJI', direction='up', change='percent'):
         """Get market movers"""
         url = f"{self.base_url}/marketdata/v1/movers/{index}"
         params = {'direction': direction, 'change': change}
-        return self._make_api_request(url, params)
+        return await self._make_api_request(url, params)
     
-    def get_current_prices(self, symbols):
+    async def get_current_prices(self, symbols):
         """Get current prices for symbols (compatible with yahoo_data_collector)"""
-        quotes_data = self.get_quotes(symbols)
+        quotes_data = await self.get_quotes(symbols)
         
         if not quotes_data:
             return {}
         
-        current_prices = {}
-        
         # Handle single symbol vs multiple symbols response format
-        if isinstance(quotes_data, dict):
-            for symbol, quote in quotes_data.items():
-                if isinstance(quote, dict) and 'mark' in quote:
-                    current_prices[symbol] = {
-                        'price': quote['mark'],
-                        'timestamp': datetime.now()
-                    }
-        
-        return current_prices
+        if not isinstance(quotes_data, dict):
+            return {}
+        
+        now = datetime.now()
+        return {
+            symbol: {'price': quote['mark'], 'timestamp': now}
+            for symbol, quote in quotes_data.items()
+            if isinstance(quote, dict) and 'mark' in quote
+        }
     
     # Account-related methods (will require additional permissions)
-    def get_account_info(self):
+    async def get_account_info(self):
         """Get account information - requires account permissions"""
         url = f"{self.base_url}/trader/v1/accounts/accountNumbers"
-        result = self._make_api_request(url)
+        result = await self._make_api_request(url)
         
         if result is None:
             self.logger.warning("Account access requires additional API permissions")
@@ -147,11 +204,11 @@ class SchwabAPI:
         
         return result
     
-    def get_current_positions(self, account_id):
+    async def get_current_positions(self, account_id):
         """Get current positions - requires account permissions"""
         url = f"{self.base_url}/trader/v1/accounts/{account_id}"
         params = {'fields': 'positions'}
-        result = self._make_api_request(url, params)
+        result = await self._make_api_request(url, params)
         
         if result is None:
             self.logger.warning("Position access requires additional API permissions")
@@ -182,7 +239,7 @@ class SchwabAPI:
         self.logger.info("For paper trading, use Schwab's web interface or mobile app")
         return None
     
-    def test_connection(self):
+    async def test_connection(self):
         """Test API connection and return capabilities"""
         self.logger.info("Testing Schwab API connection...")
         
@@ -194,7 +251,7 @@ class SchwabAPI:
         
         # Test market data
         try:
-            quotes = self.get_quotes('AAPL')
+            quotes = await self.get_quotes('AAPL')
             if quotes:
                 capabilities['market_data'] = True
                 self.logger.info("✅ Market data access working")
@@ -205,7 +262,7 @@ class SchwabAPI:
         
         # Test account access
         try:
-            accounts = self.get_account_info()
+            accounts = await self.get_account_info()
             if accounts:
                 capabilities['account_access'] = True
                 self.logger.info("✅ Account access working")
@@ -215,4 +272,7 @@ class SchwabAPI:
             self.logger.warning(f"🔒 Account access test failed: {e}")
         
         return capabilities
-
+    
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        await self._client.aclose()
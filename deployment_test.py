@@ -1,6 +1,6 @@
 from complete_system_integration import CompleteFactorMonitoringSystem, SystemConfig
 import asyncio
-import os
+from dataclasses import replace
 from dotenv import load_dotenv
 
 async def run_deployment_test():
@@ -10,23 +10,9 @@ async def run_deployment_test():
     load_dotenv()
     
     # Create test configuration
-    config = SystemConfig(
-        db_path="test_deployment.db",
-        email_sender=os.getenv('FACTOR_EMAIL'),
-        email_password=os.getenv('FACTOR_EMAIL_PASSWORD'),
-        email_recipients=os.getenv('FACTOR_RECIPIENTS', '').split(','),
-        tos_client_id=os.getenv('TOS_CLIENT_ID', ''),
-        tos_refresh_token=os.getenv('TOS_REFRESH_TOKEN', ''),
-        tos_account_id=os.getenv('TOS_ACCOUNT_ID', ''),
-        portfolio_value=float(os.getenv('PORTFOLIO_VALUE', 100000)),
-        target_allocations={
-            'Value': float(os.getenv('TARGET_VALUE', 0.30)),
-            'Growth': float(os.getenv('TARGET_GROWTH', 0.20)),
-            'Quality': float(os.getenv('TARGET_QUALITY', 0.20)),
-            'Low_Volatility': float(os.getenv('TARGET_LOW_VOLATILITY', 0.15)),
-            'Momentum': float(os.getenv('TARGET_MOMENTUM', 0.10)),
-            'Size': float(os.getenv('TARGET_SIZE', 0.05))
-        }
+    config = replace(
+        SystemConfig.from_env(portfolio_value=100000.0),
+        db_path="test_deployment.db"  # never the DB_PATH database
     )
     
     # Initialize system
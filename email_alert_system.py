@@ -1 +1,192 @@
-# Copy the clean code from the artifact above
+import smtplib
+import sqlite3
+import atexit
+import logging
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import List
+
+@dataclass
+class EmailConfig:
+    """Email alert configuration"""
+    sender_email: str = ""
+    sender_password: str = ""
+    recipient_emails: List[str] = field(default_factory=list)
+    smtp_server: str = "smtp.gmail.com"
+    smtp_port: int = 465
+
+class FactorAlertSystem:
+    """
+    Email alert system for the factor monitoring system
+    Holds one authenticated SMTP session for the lifetime of the process
+    """
+
+    def __init__(self, email_config: EmailConfig, db_path: str = "factor_data.db"):
+        self.config = email_config
+        self.db_path = db_path
+        self.logger = logging.getLogger('FactorAlerts')
+
+        # Clean up recipient list
+        self.recipients = [r.strip() for r in (email_config.recipient_emails or []) if r and r.strip()]
+
+        # Persistent SMTP session (opened lazily, reused for every send)
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _connect(self):
+        """Open and authenticate a new SMTP session"""
+        server = smtplib.SMTP_SSL(self.config.smtp_server, self.config.smtp_port, timeout=30)
+        server.login(self.config.sender_email, self.config.sender_password)
+        self._smtp = server
+        self.logger.info("SMTP connection established")
+        return server
+
+    def _get_connection(self):
+        """Return a live SMTP session, reconnecting if the current one is stale"""
+        if self._smtp is not None:
+            try:
+                status = self._smtp.noop()[0]
+                if status == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self._drop_connection()
+
+        return self._connect()
+
+    def _drop_connection(self):
+        """Discard the current SMTP session without raising"""
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def send_email(self, subject: str, html_content: str) -> bool:
+        """Send an HTML email to all recipients over the pooled connection"""
+        if not self.config.sender_email or not self.config.sender_password:
+            self.logger.warning("Email credentials not configured")
+            return False
+
+        if not self.recipients:
+            self.logger.warning("No email recipients configured")
+            return False
+
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.config.sender_email
+        msg['To'] = ', '.join(self.recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html_content, 'html'))
+        raw_message = msg.as_string()
+
+        with self._smtp_lock:
+            for attempt in range(2):
+                try:
+                    server = self._get_connection()
+                    server.sendmail(self.config.sender_email, self.recipients, raw_message)
+                    self.logger.info(f"Email sent: {subject}")
+                    return True
+
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException, OSError) as e:
+                    # Stale session or transient (4xx) reply - reconnect and retry once;
+                    # permanent 5xx rejections (auth, bad recipient) are not retried
+                    self._drop_connection()
+                    transient = not isinstance(e, smtplib.SMTPResponseException) or 400 <= e.smtp_code < 500
+                    if attempt == 0 and transient:
+                        self.logger.warning(f"SMTP session lost, reconnecting: {e}")
+                        continue
+                    self.logger.error(f"Email sending failed: {e}")
+                    break
+
+                except Exception as e:
+                    self.logger.error(f"Email sending failed: {e}")
+                    break
+
+        return False
+
+    def create_daily_report(self, latest_returns, alerts):
+        """Create HTML daily factor report"""
+        html_content = f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; margin: 20px;">
+            <h1>📊 Daily Factor Report</h1>
+            <p>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+
+            <h2>💹 Latest Factor Returns</h2>
+            <table style="border-collapse: collapse;">
+                <tr><th>Symbol</th><th>Daily Return</th></tr>
+        """
+
+        for symbol, daily_return in latest_returns:
+            color = '#27ae60' if daily_return > 0 else '#e74c3c'
+            html_content += f"""
+                <tr>
+                    <td>{symbol}</td>
+                    <td style="color: {color};">{daily_return:+.2%}</td>
+                </tr>
+            """
+
+        html_content += "</table>"
+
+        if alerts:
+            html_content += "<h2>🚨 Today's Alerts</h2>"
+            for severity, message in alerts:
+                html_content += f"<p><strong>{severity}:</strong> {message}</p>"
+        else:
+            html_content += "<h2>✅ No Alerts</h2><p>All factors within normal ranges.</p>"
+
+        html_content += """
+            <hr>
+            <p><em>This report was automatically generated by the Factor Monitoring System.</em></p>
+        </body>
+        </html>
+        """
+
+        return html_content
+
+    def send_daily_report(self) -> bool:
+        """Build the daily report from the database and send it"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                SELECT symbol, daily_return
+                FROM factor_returns
+                WHERE date = (SELECT MAX(date) FROM factor_returns)
+            ''')
+            latest_returns = cursor.fetchall()
+
+            cursor.execute('''
+                SELECT severity, message FROM alerts_log
+                WHERE timestamp >= date('now') AND timestamp < date('now', '+1 day')
+                ORDER BY timestamp DESC
+            ''')
+            alerts = cursor.fetchall()
+
+            conn.close()
+
+        except Exception as e:
+            self.logger.error(f"Failed to load report data: {e}")
+            return False
+
+        subject = f"Factor Report - {datetime.now().strftime('%Y-%m-%d')}"
+        if alerts:
+            subject += f" ({len(alerts)} alerts)"
+
+        return self.send_email(subject, self.create_daily_report(latest_returns, alerts))
+
+    def close(self):
+        """Close the pooled SMTP session"""
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except Exception:
+                    pass
+                self._smtp = None
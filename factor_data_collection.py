@@ -4,28 +4,127 @@ import numpy as np
 from datetime import datetime, timedelta, date
 import requests
 import json
+import re
 import sqlite3
 import logging
+import threading
+import asyncio
+from contextlib import contextmanager
 from typing import Dict, List, Tuple
 import warnings
-warnings.filterwarnings('ignore')
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('factor_monitoring.log'),
-        logging.StreamHandler()
-    ]
+try:
+    import requests_cache
+except ImportError:  # requests-cache is optional
+    requests_cache = None
+
+# yfinance 0.2.54+ rejects any session that isn't curl_cffi (YFDataException), so
+# a requests-cache session can only be handed to older releases (unknown version: don't)
+_YF_VERSION = tuple(int(part) for part in re.findall(r'\d+', getattr(yf, '__version__', ''))[:3])
+YF_ACCEPTS_REQUESTS_SESSION = bool(_YF_VERSION) and _YF_VERSION < (0, 2, 54)
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional
+    pa = None
+
+try:
+    import aiosqlite
+except ImportError:  # aiosqlite is optional
+    aiosqlite = None
+
+_LOGGER_CONFIGURED = False
+
+def _configure_logging(level: int = logging.INFO):
+    """Configure collector logging once, on first use rather than at import"""
+    global _LOGGER_CONFIGURED
+    if _LOGGER_CONFIGURED:
+        return
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('factor_monitoring.log'),
+            logging.StreamHandler()
+        ]
+    )
+    _LOGGER_CONFIGURED = True
+
+# Applied to every connection: WAL journal, fewer fsyncs, bigger page cache
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
 )
 
+# Spread name -> (long leg, short leg) return columns
+SPREAD_PAIRS = {
+    'Value_Growth_Spread': ('Value_VTV', 'Growth_VUG'),
+    'Small_Large_Spread': ('Small_Cap', 'Market_SPY'),
+    'Quality_Market_Spread': ('Quality_QUAL', 'Market_SPY'),
+    'LowVol_Market_Spread': ('Low_Volatility_USMV', 'Market_SPY'),
+}
+
+# Spread column -> factor_metrics column
+METRIC_COLUMNS = {
+    'Value_Growth_Spread': 'value_growth_spread',
+    'Small_Large_Spread': 'small_large_spread',
+    'Quality_Market_Spread': 'quality_junk_spread',
+}
+
+# Upserts shared by the sqlite3 and aiosqlite write paths
+PRICE_UPSERT = '''
+    INSERT OR REPLACE INTO factor_prices 
+    (date, symbol, close) 
+    VALUES (?, ?, ?)
+'''
+RETURN_UPSERT = '''
+    INSERT OR REPLACE INTO factor_returns 
+    (date, symbol, daily_return) 
+    VALUES (?, ?, ?)
+'''
+METRIC_UPSERT = '''
+    INSERT OR REPLACE INTO factor_metrics 
+    (date, value_growth_spread, small_large_spread, quality_junk_spread) 
+    VALUES (?, ?, ?, ?)
+'''
+ALERT_INSERT = '''
+    INSERT INTO alerts_log 
+    (timestamp, alert_type, factor, message, severity) 
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# VIX levels separating low (0) / medium (1) / high (2) volatility regimes
+VIX_REGIME_BOUNDS = np.array([20.0, 30.0])
+
+def _scan_alerts(values, mid, hi):
+    """Indices of moves larger than mid and whether each is larger than hi"""
+    magnitude = np.abs(values)
+    idx = np.nonzero(magnitude > mid)[0]
+    return idx, magnitude[idx] > hi
+
+def _to_columnar(df: pd.DataFrame, as_arrow: bool = False):
+    """List of records, or an Arrow table when as_arrow is requested (needs pyarrow)"""
+    if as_arrow:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    return df.to_dict('records')
+
+def open_connection(db_path: str) -> sqlite3.Connection:
+    """Open a SQLite connection with the collector's PRAGMA tuning applied"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 class FactorDataCollector:
     """
     Comprehensive factor data collection system for cost-effective monitoring
     """
     
-    def __init__(self, db_path: str = "factor_data.db"):
+    def __init__(self, db_path: str = "factor_data.db", bypass_cache: bool = False):
+        _configure_logging()
         self.db_path = db_path
         self.factor_etfs = {
             'Value': 'VTV',
@@ -47,12 +146,60 @@ class FactorDataCollector:
         }
         
         self.alpha_vantage_key = "YOUR_ALPHA_VANTAGE_KEY"  # Free tier available
+        
+        # On-disk HTTP cache for yfinance so repeat runs within the hour skip the network;
+        # newer yfinance keeps its own curl_cffi session, so no cache there
+        self.session = None
+        if requests_cache is not None and YF_ACCEPTS_REQUESTS_SESSION and not bypass_cache:
+            self.session = requests_cache.CachedSession(
+                '.cache/yf', backend='sqlite', expire_after=timedelta(hours=1)
+            )
+        
+        # One long-lived connection shared by every read and write
+        self._conn = None
+        self._db_lock = threading.RLock()
+        self._tx_depth = 0
+        self._tx_failed = False
+        
         self.initialize_database()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Return the shared database connection, opening it on first use"""
+        if self._conn is None:
+            self._conn = open_connection(self.db_path)
+        return self._conn
+    
+    @contextmanager
+    def _transaction(self):
+        """Hold the database lock; the outermost block commits, or rolls back if any level failed"""
+        with self._db_lock:
+            conn = self._connect()
+            if self._tx_depth == 0:
+                self._tx_failed = False
+            self._tx_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._tx_failed = True
+                raise
+            finally:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    if self._tx_failed:
+                        conn.rollback()
+                    else:
+                        conn.commit()
+    
+    def close(self):
+        """Close the shared database connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
         
     def initialize_database(self):
         """Initialize SQLite database for data storage"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             # Create tables
@@ -102,8 +249,13 @@ class FactorDataCollector:
                 )
             ''')
             
+            # factor_prices / factor_returns lookups by date (MAX(date), date ranges)
+            # are served by their (date, symbol) primary keys; alerts_log has none
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts_log(timestamp)
+            ''')
+            
             conn.commit()
-            conn.close()
             logging.info("Database initialized successfully")
             
         except Exception as e:
@@ -111,39 +263,39 @@ class FactorDataCollector:
     
     def collect_factor_data(self, period: str = "1y") -> pd.DataFrame:
         """Collect factor ETF price data"""
-        try:
-            all_data = {}
-            
-            # Collect ETF data
-            for factor_name, ticker in self.factor_etfs.items():
-                try:
-                    stock = yf.Ticker(ticker)
-                    hist = stock.history(period=period)
-                    if not hist.empty:
-                        all_data[f"{factor_name}_{ticker}"] = hist['Close']
-                        logging.info(f"Collected data for {factor_name} ({ticker})")
-                except Exception as e:
-                    logging.warning(f"Failed to collect {ticker}: {e}")
-            
-            # Collect economic indicators
-            for indicator, ticker in self.economic_indicators.items():
-                try:
-                    stock = yf.Ticker(ticker)
-                    hist = stock.history(period=period)
-                    if not hist.empty:
-                        all_data[f"{indicator}"] = hist['Close']
-                        logging.info(f"Collected data for {indicator}")
-                except Exception as e:
-                    logging.warning(f"Failed to collect {indicator}: {e}")
-            
-            df = pd.DataFrame(all_data)
-            df.index = pd.to_datetime(df.index)
-            df = df.dropna()
-            
-            # Store in database
+        df = self._download_prices(period)
+        
+        # Store in database
+        if not df.empty:
             self.store_price_data(df)
+        
+        return df
+    
+    def _download_prices(self, period: str) -> pd.DataFrame:
+        """Download closing prices for every tracked ticker (no database writes)"""
+        try:
+            # Column label for every ticker we track
+            labels = {ticker: f"{factor_name}_{ticker}" for factor_name, ticker in self.factor_etfs.items()}
+            labels.update({ticker: indicator for indicator, ticker in self.economic_indicators.items()})
+            
+            # One threaded download for all symbols
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                raw = yf.download(list(labels), period=period, group_by='ticker',
+                                  threads=True, auto_adjust=True, progress=False,
+                                  session=self.session)
+            
+            # Slice every ticker's Close column out in one step
+            closes = raw.xs('Close', axis=1, level=1).dropna(axis=1, how='all')
+            for ticker in labels.keys() - set(closes.columns):
+                logging.warning(f"Failed to collect {ticker}")
+            
+            collected = [ticker for ticker in labels if ticker in closes.columns]
+            df = closes[collected].rename(columns=labels)
+            logging.info(f"Collected data for {len(collected)} instruments")
             
-            return df
+            df.index = pd.to_datetime(df.index)
+            return df.dropna()
             
         except Exception as e:
             logging.error(f"Data collection error: {e}")
@@ -152,57 +304,59 @@ class FactorDataCollector:
     def store_price_data(self, df: pd.DataFrame):
         """Store price data in SQLite database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            for date_idx in df.index:
-                date_str = date_idx.strftime('%Y-%m-%d')
-                
-                for column in df.columns:
-                    if '_' in column:
-                        symbol = column.split('_')[-1]
-                    else:
-                        symbol = column
-                    
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO factor_prices 
-                        (date, symbol, close) 
-                        VALUES (?, ?, ?)
-                    ''', (date_str, symbol, float(df.loc[date_idx, column])))
+            # Wide (date x symbol) frame -> long (date, symbol, close) rows
+            rows = self._price_rows(df)
             
-            conn.commit()
-            conn.close()
+            with self._transaction() as conn:
+                conn.executemany(PRICE_UPSERT, rows)
             logging.info("Price data stored in database")
             
         except Exception as e:
             logging.error(f"Database storage error: {e}")
+            raise
+    
+    def _price_rows(self, df: pd.DataFrame) -> List[Tuple[str, str, float]]:
+        """Flatten a wide price frame into (date, symbol, close) rows, skipping missing closes"""
+        dates = df.index.strftime('%Y-%m-%d')
+        symbols = [c.rsplit('_', 1)[-1] for c in df.columns]
+        return [
+            (date_str, symbol, close)
+            for date_str, row in zip(dates, df.to_numpy(dtype=np.float64).tolist())
+            for symbol, close in zip(symbols, row)
+            if close == close  # NaN != NaN
+        ]
+    
+    async def _store_price_data_async(self, conn, df: pd.DataFrame):
+        """Write price rows over an aiosqlite connection (the caller commits)"""
+        await conn.executemany(PRICE_UPSERT, self._price_rows(df))
     
     def calculate_factor_returns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculate factor returns and spreads"""
+        returns, spreads = self._compute_returns(df)
+        
+        # Store returns in database (failures propagate so the caller's transaction rolls back)
+        if not returns.empty:
+            self.store_returns_data(returns, spreads)
+        
+        return returns, spreads
+    
+    def _compute_returns(self, df: pd.DataFrame):
+        """Daily returns and spreads for a price frame (no database writes)"""
         try:
             returns = df.pct_change().dropna()
             
-            # Calculate key spreads
-            spreads = pd.DataFrame(index=returns.index)
-            
-            # Value vs Growth spread
-            if 'Value_VTV' in returns.columns and 'Growth_VUG' in returns.columns:
-                spreads['Value_Growth_Spread'] = returns['Value_VTV'] - returns['Growth_VUG']
-            
-            # Small vs Large spread  
-            if 'Small_Cap' in returns.columns and 'Market_SPY' in returns.columns:
-                spreads['Small_Large_Spread'] = returns['Small_Cap'] - returns['Market_SPY']
-            
-            # Quality vs Market spread
-            if 'Quality_QUAL' in returns.columns and 'Market_SPY' in returns.columns:
-                spreads['Quality_Market_Spread'] = returns['Quality_QUAL'] - returns['Market_SPY']
-            
-            # Low Vol vs Market spread
-            if 'Low_Volatility_USMV' in returns.columns and 'Market_SPY' in returns.columns:
-                spreads['LowVol_Market_Spread'] = returns['Low_Volatility_USMV'] - returns['Market_SPY']
-            
-            # Store returns in database
-            self.store_returns_data(returns, spreads)
+            # Calculate key spreads (long leg minus short leg) in one array op
+            present = {
+                name: legs for name, legs in SPREAD_PAIRS.items()
+                if legs[0] in returns.columns and legs[1] in returns.columns
+            }
+            left = [a for a, _ in present.values()]
+            right = [b for _, b in present.values()]
+            spreads = pd.DataFrame(
+                returns[left].to_numpy() - returns[right].to_numpy(),
+                index=returns.index,
+                columns=list(present)
+            )
             
             return returns, spreads
             
@@ -210,61 +364,61 @@ class FactorDataCollector:
             logging.error(f"Returns calculation error: {e}")
             return pd.DataFrame(), pd.DataFrame()
     
+    def _return_rows(self, returns: pd.DataFrame) -> List[Tuple[str, str, float]]:
+        """Flatten a wide returns frame into (date, symbol, daily_return) rows"""
+        # Walk the raw ndarray rather than going through the pandas indexer
+        dates = returns.index.strftime('%Y-%m-%d')
+        columns = returns.columns.tolist()
+        return [
+            (date_str, col, v)
+            for date_str, row in zip(dates, returns.to_numpy(dtype=np.float64).tolist())
+            for col, v in zip(columns, row)
+        ]
+    
+    def _metric_rows(self, spreads: pd.DataFrame) -> List[Tuple]:
+        """(date, value_growth, small_large, quality_junk) rows for factor_metrics"""
+        metrics = spreads.reindex(columns=list(METRIC_COLUMNS)).to_numpy(dtype=np.float64).tolist()
+        return [
+            (date_str, *row)
+            for date_str, row in zip(spreads.index.strftime('%Y-%m-%d'), metrics)
+        ]
+    
     def store_returns_data(self, returns: pd.DataFrame, spreads: pd.DataFrame):
         """Store returns and spreads in database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            for date_idx in returns.index:
-                date_str = date_idx.strftime('%Y-%m-%d')
-                
-                # Store individual returns
-                for column in returns.columns:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO factor_returns 
-                        (date, symbol, daily_return) 
-                        VALUES (?, ?, ?)
-                    ''', (date_str, column, float(returns.loc[date_idx, column])))
+            with self._transaction() as conn:
+                conn.executemany(RETURN_UPSERT, self._return_rows(returns))
                 
                 # Store spreads as metrics
                 if not spreads.empty:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO factor_metrics 
-                        (date, value_growth_spread, small_large_spread, quality_junk_spread) 
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        date_str,
-                        float(spreads.loc[date_idx, 'Value_Growth_Spread']) if 'Value_Growth_Spread' in spreads.columns else None,
-                        float(spreads.loc[date_idx, 'Small_Large_Spread']) if 'Small_Large_Spread' in spreads.columns else None,
-                        float(spreads.loc[date_idx, 'Quality_Market_Spread']) if 'Quality_Market_Spread' in spreads.columns else None
-                    ))
-            
-            conn.commit()
-            conn.close()
+                    conn.executemany(METRIC_UPSERT, self._metric_rows(spreads))
             logging.info("Returns data stored in database")
             
         except Exception as e:
             logging.error(f"Returns storage error: {e}")
+            raise
     
     def detect_volatility_regime(self, vix_data: pd.Series) -> int:
         """Detect current volatility regime"""
         try:
-            latest_vix = vix_data.iloc[-1]
-            
-            if latest_vix > 30:
-                return 2  # High volatility
-            elif latest_vix > 20:
-                return 1  # Medium volatility
-            else:
-                return 0  # Low volatility
-                
+            # Count of bounds strictly below the latest VIX: 0 low, 1 medium, 2 high
+            return int(np.searchsorted(VIX_REGIME_BOUNDS, vix_data.iloc[-1], side='left'))
+            
         except Exception as e:
             logging.error(f"Volatility regime detection error: {e}")
             return 1  # Default to medium
     
     def generate_alerts(self, returns: pd.DataFrame, spreads: pd.DataFrame) -> List[Dict]:
         """Generate alerts based on factor movements"""
+        alerts = self._build_alerts(returns, spreads)
+        
+        # Store alerts in database (failures propagate to the caller)
+        self.store_alerts(alerts)
+        
+        return alerts
+    
+    def _build_alerts(self, returns: pd.DataFrame, spreads: pd.DataFrame) -> List[Dict]:
+        """Alerts for the latest day's moves and spreads (no database writes)"""
         alerts = []
         
         try:
@@ -272,16 +426,22 @@ class FactorDataCollector:
             latest_spreads = spreads.iloc[-1] if not spreads.empty else pd.Series()
             
             # Large daily moves alert
-            for factor in latest_returns.index:
-                if abs(latest_returns[factor]) > 0.025:  # 2.5% threshold
-                    severity = "HIGH" if abs(latest_returns[factor]) > 0.04 else "MEDIUM"
-                    alerts.append({
-                        'type': 'LARGE_MOVE',
-                        'factor': factor,
-                        'message': f"{factor} moved {latest_returns[factor]:.2%} today",
-                        'severity': severity,
-                        'value': latest_returns[factor]
-                    })
+            values = latest_returns.to_numpy(dtype=np.float64)
+            idx, high = _scan_alerts(values, 0.025, 0.04)  # 2.5% / 4% thresholds
+            
+            # Python only touches the sparse set of triggering factors
+            factors = latest_returns.index.to_numpy()[idx].tolist()
+            moves = values[idx].tolist()
+            alerts.extend(
+                {
+                    'type': 'LARGE_MOVE',
+                    'factor': factor,
+                    'message': f"{factor} moved {move:.2%} today",
+                    'severity': "HIGH" if is_high else "MEDIUM",
+                    'value': move
+                }
+                for factor, move, is_high in zip(factors, moves, high.tolist())
+            )
             
             # Spread alerts
             if 'Value_Growth_Spread' in latest_spreads.index:
@@ -294,67 +454,70 @@ class FactorDataCollector:
                         'value': latest_spreads['Value_Growth_Spread']
                     })
             
-            # Store alerts in database
-            self.store_alerts(alerts)
-            
-            return alerts
-            
         except Exception as e:
             logging.error(f"Alert generation error: {e}")
             return []
+        
+        return alerts
+    
+    def _alert_rows(self, alerts: List[Dict]) -> List[Tuple]:
+        """alerts_log rows, all stamped with the current time"""
+        timestamp = datetime.now().isoformat()
+        return [
+            (timestamp, alert['type'], alert['factor'], alert['message'], alert['severity'])
+            for alert in alerts
+        ]
     
     def store_alerts(self, alerts: List[Dict]):
         """Store alerts in database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            for alert in alerts:
-                cursor.execute('''
-                    INSERT INTO alerts_log 
-                    (timestamp, alert_type, factor, message, severity) 
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    datetime.now().isoformat(),
-                    alert['type'],
-                    alert['factor'],
-                    alert['message'],
-                    alert['severity']
-                ))
-            
-            conn.commit()
-            conn.close()
+            with self._transaction() as conn:
+                conn.executemany(ALERT_INSERT, self._alert_rows(alerts))
             
         except Exception as e:
             logging.error(f"Alert storage error: {e}")
+            raise
     
-    def get_factor_summary(self) -> Dict:
-        """Generate factor performance summary"""
+    def get_factor_summary(self, as_arrow: bool = False) -> Dict:
+        """Generate factor performance summary (rows as records; Arrow tables if as_arrow)"""
+        if as_arrow and pa is None:
+            raise ImportError("pyarrow is required for as_arrow=True")
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # Get latest data
-            latest_returns = pd.read_sql_query('''
-                SELECT symbol, daily_return 
-                FROM factor_returns 
-                WHERE date = (SELECT MAX(date) FROM factor_returns)
-            ''', conn)
-            
-            # Get recent alerts
-            recent_alerts = pd.read_sql_query('''
-                SELECT * FROM alerts_log 
-                WHERE date(timestamp) = date('now')
-                ORDER BY timestamp DESC
-            ''', conn)
-            
-            conn.close()
+            conn = self._connect()
+            
+            # Today's alerts as a range on the raw timestamp so idx_alerts_ts applies
+            today_filter = "timestamp >= date('now') AND timestamp < date('now', '+1 day')"
+            
+            with self._db_lock:
+                # Alert counts aggregated in SQL
+                alerts_count, high_priority_alerts = conn.execute(f'''
+                    SELECT COUNT(*), COALESCE(SUM(severity = 'HIGH'), 0)
+                    FROM alerts_log 
+                    WHERE {today_filter}
+                ''').fetchone()
+                
+                # Get latest data
+                latest_returns = pd.read_sql_query('''
+                    SELECT symbol, daily_return 
+                    FROM factor_returns 
+                    WHERE date = (SELECT MAX(date) FROM factor_returns)
+                ''', conn)
+                
+                # Get recent alerts
+                recent_alerts = pd.read_sql_query(f'''
+                    SELECT * FROM alerts_log 
+                    WHERE {today_filter}
+                    ORDER BY timestamp DESC
+                    LIMIT 5
+                ''', conn)
             
             summary = {
                 'date': datetime.now().strftime('%Y-%m-%d'),
-                'latest_returns': latest_returns.to_dict('records'),
-                'alerts_count': len(recent_alerts),
-                'high_priority_alerts': len(recent_alerts[recent_alerts['severity'] == 'HIGH']),
-                'recent_alerts': recent_alerts.head(5).to_dict('records')
+                'latest_returns': _to_columnar(latest_returns, as_arrow),
+                'alerts_count': alerts_count,
+                'high_priority_alerts': high_priority_alerts,
+                'recent_alerts': _to_columnar(recent_alerts, as_arrow)
             }
             
             return summary
@@ -363,23 +526,81 @@ class FactorDataCollector:
             logging.error(f"Summary generation error: {e}")
             return {}
     
-    def run_daily_collection(self):
+    async def run_daily_collection_async(self, period: str = "3mo"):
+        """Async daily collection: the price write overlaps the returns computation"""
+        if aiosqlite is None:
+            return await asyncio.to_thread(self.run_daily_collection, period)
+        
+        try:
+            logging.info("Starting daily factor data collection")
+            
+            # Network fetch off the event loop
+            df = await asyncio.to_thread(self._download_prices, period)
+            
+            if df.empty:
+                logging.error("No data collected, exiting")
+                return
+            
+            async with aiosqlite.connect(self.db_path) as conn:
+                for pragma in SQLITE_PRAGMAS:
+                    await conn.execute(pragma)
+                
+                # Prices are written on aiosqlite's thread while returns/spreads/alerts are computed here;
+                # every write goes through this connection and commits once, so the ingest stays atomic
+                # (leaving the block without the commit closes the connection and rolls it all back)
+                store_task = asyncio.create_task(self._store_price_data_async(conn, df))
+                await asyncio.sleep(0)  # let the task hand its write to aiosqlite's thread
+                returns, spreads = self._compute_returns(df)
+                alerts = self._build_alerts(returns, spreads) if not returns.empty else []
+                await store_task
+                
+                if not returns.empty:
+                    await conn.executemany(RETURN_UPSERT, self._return_rows(returns))
+                    if not spreads.empty:
+                        await conn.executemany(METRIC_UPSERT, self._metric_rows(spreads))
+                await conn.executemany(ALERT_INSERT, self._alert_rows(alerts))
+                await conn.commit()
+            
+            summary = self.get_factor_summary()
+            
+            logging.info(f"Daily collection completed. Generated {len(alerts)} alerts")
+            
+            return {
+                'data': df,
+                'returns': returns,
+                'spreads': spreads,
+                'alerts': alerts,
+                'summary': summary
+            }
+            
+        except Exception as e:
+            logging.error(f"Daily collection error: {e}")
+            return None
+    
+    def run_daily_collection(self, period: str = "3mo"):
         """Run complete daily data collection and analysis"""
         try:
             logging.info("Starting daily factor data collection")
             
-            # Collect data
-            df = self.collect_factor_data(period="3mo")  # 3 months for daily updates
+            # Collect data (network fetch, outside the database lock)
+            df = self._download_prices(period)  # 3 months by default for daily updates
             
             if df.empty:
                 logging.error("No data collected, exiting")
                 return
             
             # Calculate returns and spreads
-            returns, spreads = self.calculate_factor_returns(df)
+            returns, spreads = self._compute_returns(df)
             
-            # Generate alerts
-            alerts = self.generate_alerts(returns, spreads)
+            # One connection and one commit for the whole ingest; the lock covers only the writes
+            with self._transaction():
+                self.store_price_data(df)
+                
+                if not returns.empty:
+                    self.store_returns_data(returns, spreads)
+                
+                # Generate alerts
+                alerts = self.generate_alerts(returns, spreads)
             
             # Generate summary
             summary = self.get_factor_summary()
@@ -395,7 +616,8 @@ class FactorDataCollector:
             }
             
         except Exception as e:
-            logging.error(f"Daily collection error: {e}")
+            # Any store failure lands here after the transaction rolled the whole ingest back
+            logging.error(f"Daily collection error (nothing stored): {e}")
             return None
 
 
@@ -9,14 +9,59 @@ IMPORTANT: Make sure you have:
 3. You have your Client ID and callback URL configured
 """
 
-import requests
-import urllib.parse as up
-from urllib.parse import unquote, quote
+import asyncio
+import httpx
+from urllib.parse import quote, unquote_plus, urlencode
 import json
 import base64
+import functools
 import os
+import re
+import shutil
+import sys
+import tempfile
 from datetime import datetime
 
+try:
+    import h2
+except ImportError:  # h2 is optional (httpx[http2]); fall back to HTTP/1.1
+    h2 = None
+
+# Schwab token lines replaced on every save (exact names, not substrings)
+_SCHWAB_ENV_RE = re.compile(rb'^(SCHWAB_CLIENT_ID|SCHWAB_REFRESH_TOKEN|SCHWAB_ACCESS_TOKEN)=')
+
+# One pooled client shared by every authenticator in the process (HTTP/2 when h2 is installed)
+_client = None
+
+def _get_client():
+    """Return the shared AsyncClient, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        # Limits and HTTP/2 live on the transport so connect retries can be enabled too
+        transport = httpx.AsyncHTTPTransport(
+            http2=h2 is not None,
+            retries=3,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+        _client = httpx.AsyncClient(transport=transport, timeout=30.0)
+    return _client
+
+# Gateway/rate-limit statuses retried on token POSTs (urllib3 Retry equivalent)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+
+def _emit(lines):
+    """Write a block of console lines with a single stdout write"""
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+@functools.lru_cache(maxsize=1)
+def _ensure_env_loaded():
+    """Load .env into os.environ once per process"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
+
 class SchwabAuthenticator:
     """Handles Schwab API OAuth2 authentication"""
     
@@ -25,10 +70,19 @@ class SchwabAuthenticator:
         self.redirect_uri = redirect_uri
         self.client_secret = client_secret  # Schwab uses client secret for some flows
         
+        # Schwab uses Basic authentication with client credentials (encoded once)
+        self._auth_header = None
+        if client_secret:
+            credentials = f"{client_id}:{client_secret}"
+            self._auth_header = f"Basic {base64.b64encode(credentials.encode()).decode()}"
+        
         # Schwab API endpoints
         self.auth_url = "https://api.schwabapi.com/v1/oauth/authorize"
         self.token_url = "https://api.schwabapi.com/v1/oauth/token"
         
+        # Pooled client so repeated token calls reuse the TLS connection
+        self._client = _get_client()
+        
         print(f"🦆 Schwab API Authenticator Initialized")
         print(f"   Client ID: {self.client_id}")
         print(f"   Redirect URI: {self.redirect_uri}")
@@ -43,45 +97,57 @@ class SchwabAuthenticator:
             'redirect_uri': self.redirect_uri
         }
         
-        # Build URL with proper encoding
-        auth_url = f"{self.auth_url}?" + "&".join([
-            f"{key}={quote(str(value))}" for key, value in params.items()
-        ])
-        
-        return auth_url
+        # Build URL with proper encoding (same quoting as before, '/' left as-is)
+        return f"{self.auth_url}?{urlencode(params, safe='/', quote_via=quote)}"
     
     def extract_code_from_callback(self, callback_url):
         """Extract authorization code from callback URL"""
         try:
-            # Parse the URL
-            parsed_url = up.urlparse(callback_url)
+            # Only the code/error keys matter, so scan the query string directly
+            query = callback_url.partition('?')[2].partition('#')[0]
             
-            # Extract query parameters
-            query_params = up.parse_qs(parsed_url.query)
+            params = {}
+            for pair in query.split('&'):
+                key, _, value = pair.partition('=')
+                # Blank values count as absent (as parse_qs treats them), so '?code=' is no code
+                if not value:
+                    continue
+                if key == 'code':
+                    code = unquote_plus(value)
+                    print(f"✅ Authorization code extracted successfully")
+                    print(f"   Code length: {len(code)} characters")
+                    return code
+                if key:
+                    params.setdefault(key, value)
             
-            if 'code' in query_params:
-                code = query_params['code'][0]
-                print(f"✅ Authorization code extracted successfully")
-                print(f"   Code length: {len(code)} characters")
-                return unquote(code)
-            else:
-                print("❌ No authorization code found in URL")
-                print(f"   Available parameters: {list(query_params.keys())}")
-                
-                # Check for error
-                if 'error' in query_params:
-                    error = query_params['error'][0]
-                    error_desc = query_params.get('error_description', ['Unknown'])[0]
-                    print(f"❌ Error in callback: {error}")
-                    print(f"   Description: {error_desc}")
-                
-                return None
+            print("❌ No authorization code found in URL")
+            print(f"   Available parameters: {list(params.keys())}")
+            
+            # Check for error
+            if 'error' in params:
+                print(f"❌ Error in callback: {unquote_plus(params['error'])}")
+                print(f"   Description: {unquote_plus(params.get('error_description', 'Unknown'))}")
+            
+            return None
                 
         except Exception as e:
             print(f"❌ Error parsing callback URL: {e}")
             return None
     
-    def exchange_code_for_tokens(self, authorization_code):
+    async def _post_token(self, token_data, headers):
+        """POST to the token endpoint, retrying transient gateway/rate-limit responses"""
+        for attempt in range(RETRY_TOTAL + 1):
+            response = await self._client.post(self.token_url, data=token_data, headers=headers, timeout=30.0)
+            if response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                return response
+            
+            # Honour a numeric Retry-After, otherwise back off exponentially
+            retry_after = response.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.isdigit() else RETRY_BACKOFF * (2 ** attempt)
+            print(f"⚠️  Token endpoint returned {response.status_code}, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+    
+    async def exchange_code_for_tokens(self, authorization_code):
         """Exchange authorization code for access and refresh tokens"""
         
         print("🔄 Exchanging authorization code for tokens...")
@@ -94,52 +160,41 @@ class SchwabAuthenticator:
             'redirect_uri': self.redirect_uri
         }
         
-        # Schwab uses Basic authentication with client credentials
-        auth_header = None
-        if self.client_secret:
-            # Encode client credentials for Basic auth
-            credentials = f"{self.client_id}:{self.client_secret}"
-            encoded_credentials = base64.b64encode(credentials.encode()).decode()
-            auth_header = f"Basic {encoded_credentials}"
-        
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
             'Accept': 'application/json'
         }
         
-        if auth_header:
-            headers['Authorization'] = auth_header
+        if self._auth_header:
+            headers['Authorization'] = self._auth_header
         
         try:
             print("📤 Sending token request to Schwab...")
             
-            response = requests.post(
-                self.token_url, 
-                data=token_data, 
-                headers=headers,
-                timeout=30
-            )
+            response = await self._post_token(token_data, headers)
             
             print(f"📥 Response status: {response.status_code}")
             
             if response.status_code == 200:
                 tokens = response.json()
                 
-                print("✅ SUCCESS! Tokens received from Schwab")
-                
-                # Display token information (safely)
-                print(f"\n🔑 TOKEN INFORMATION:")
-                print(f"   Access Token: {tokens.get('access_token', 'N/A')[:20]}...")
+                # Display token information (safely), written in one go
+                out = [
+                    "✅ SUCCESS! Tokens received from Schwab",
+                    f"\n🔑 TOKEN INFORMATION:",
+                    f"   Access Token: {tokens.get('access_token', 'N/A')[:20]}..."
+                ]
                 
                 if 'refresh_token' in tokens:
-                    print(f"   Refresh Token: {tokens['refresh_token'][:20]}...")
-                    print(f"   Refresh Token Length: {len(tokens['refresh_token'])} chars")
+                    out.append(f"   Refresh Token: {tokens['refresh_token'][:20]}...")
+                    out.append(f"   Refresh Token Length: {len(tokens['refresh_token'])} chars")
                 else:
-                    print("   Refresh Token: Not provided (may require different scope)")
+                    out.append("   Refresh Token: Not provided (may require different scope)")
                 
-                print(f"   Token Type: {tokens.get('token_type', 'N/A')}")
-                print(f"   Expires In: {tokens.get('expires_in', 'N/A')} seconds")
-                print(f"   Scope: {tokens.get('scope', 'N/A')}")
+                out.append(f"   Token Type: {tokens.get('token_type', 'N/A')}")
+                out.append(f"   Expires In: {tokens.get('expires_in', 'N/A')} seconds")
+                out.append(f"   Scope: {tokens.get('scope', 'N/A')}")
+                _emit(out)
                 
                 return tokens
                 
@@ -156,46 +211,85 @@ class SchwabAuthenticator:
                 
                 return None
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             print("❌ Request timed out - check your internet connection")
             return None
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ Request failed: {e}")
             return None
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
             return None
     
+    async def refresh_access_token(self, refresh_token):
+        """Exchange a refresh token for a new access token"""
+        token_data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': refresh_token,
+            'client_id': self.client_id
+        }
+        
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json'
+        }
+        
+        if self._auth_header:
+            headers['Authorization'] = self._auth_header
+        
+        try:
+            response = await self._post_token(token_data, headers)
+            if response.status_code == 200:
+                return response.json()
+            
+            print(f"❌ Token refresh failed with status {response.status_code}")
+            print(f"   Response: {response.text}")
+            return None
+            
+        except httpx.HTTPError as e:
+            print(f"❌ Token refresh failed: {e}")
+            return None
+    
     def save_tokens_to_env(self, tokens):
         """Save tokens to .env file"""
+        tmp_path = None
         try:
-            env_lines = []
+            # mkstemp creates the file 0600, so the tokens are never world-readable mid-write
+            fd, tmp_path = tempfile.mkstemp(dir='.', prefix='.env.', suffix='.tmp')
             
-            # Read existing .env file
-            if os.path.exists('.env'):
-                with open('.env', 'r') as f:
-                    env_lines = f.readlines()
-            
-            # Remove existing Schwab token lines
-            env_lines = [line for line in env_lines if not any(
-                schwab_var in line for schwab_var in [
-                    'SCHWAB_CLIENT_ID', 'SCHWAB_REFRESH_TOKEN', 'SCHWAB_ACCESS_TOKEN'
+            with os.fdopen(fd, 'wb') as dst:
+                # Copy the existing .env byte-for-byte, dropping old Schwab token lines
+                if os.path.exists('.env'):
+                    with open('.env', 'rb') as src:
+                        for line in src:
+                            if not _SCHWAB_ENV_RE.match(line):
+                                dst.write(line)
+                
+                # Add new token information
+                new_lines = [
+                    f"\n# Schwab API Configuration - Added {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+                    f"SCHWAB_CLIENT_ID={self.client_id}\n"
                 ]
-            )]
-            
-            # Add new token information
-            env_lines.append(f"\n# Schwab API Configuration - Added {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            env_lines.append(f"SCHWAB_CLIENT_ID={self.client_id}\n")
+                
+                if 'refresh_token' in tokens:
+                    new_lines.append(f"SCHWAB_REFRESH_TOKEN={tokens['refresh_token']}\n")
+                
+                if 'access_token' in tokens:
+                    new_lines.append(f"SCHWAB_ACCESS_TOKEN={tokens['access_token']}\n")
+                
+                dst.write(''.join(new_lines).encode('utf-8'))
             
-            if 'refresh_token' in tokens:
-                env_lines.append(f"SCHWAB_REFRESH_TOKEN={tokens['refresh_token']}\n")
+            # Keep an existing .env's permissions; a new one stays owner-only
+            if os.path.exists('.env'):
+                shutil.copymode('.env', tmp_path)
             
-            if 'access_token' in tokens:
-                env_lines.append(f"SCHWAB_ACCESS_TOKEN={tokens['access_token']}\n")
+            # Atomic swap so a crash never leaves a half-written .env
+            os.replace(tmp_path, '.env')
+            tmp_path = None
             
-            # Write back to .env file
-            with open('.env', 'w') as f:
-                f.writelines(env_lines)
+            # Let the next credential check re-read .env; load_dotenv only fills variables
+            # that aren't already set, so values loaded earlier in this process are kept
+            _ensure_env_loaded.cache_clear()
             
             print(f"✅ Tokens saved to .env file")
             print(f"   File location: {os.path.abspath('.env')}")
@@ -205,6 +299,21 @@ class SchwabAuthenticator:
         except Exception as e:
             print(f"❌ Failed to save tokens: {e}")
             return False
+        
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    async def close(self):
+        """Close the pooled HTTP client"""
+        await self._client.aclose()
+
+async def _exchange_and_close(authenticator, auth_code):
+    """Run the token exchange on the event loop, then release the client"""
+    try:
+        return await authenticator.exchange_code_for_tokens(auth_code)
+    finally:
+        await authenticator.close()
 
 def get_schwab_refresh_token():
     """Main function to get Schwab refresh token"""
@@ -244,18 +353,18 @@ def get_schwab_refresh_token():
     print(f"\n🔗 STEP 1: Authorization URL Generated")
     auth_url = authenticator.get_authorization_url(scope="readonly")
     
-    print(f"\n🔗 AUTHORIZATION URL:")
-    print(f"{auth_url}")
-    
-    print(f"\n📋 INSTRUCTIONS:")
-    print(f"1. 🌐 COPY the URL above and paste it into your browser")
-    print(f"2. 🔐 Log in to your Schwab account") 
-    print(f"3. ✅ Click 'Authorize' or 'Allow' when prompted")
-    print(f"4. ⚠️  Your browser will try to go to {redirect_uri} and show an error")
-    print(f"5. 📋 COPY the ENTIRE URL from your browser address bar")
-    print(f"6. 📥 PASTE it below")
-    
-    print(f"\n" + "=" * 60)
+    _emit([
+        f"\n🔗 AUTHORIZATION URL:",
+        f"{auth_url}",
+        f"\n📋 INSTRUCTIONS:",
+        f"1. 🌐 COPY the URL above and paste it into your browser",
+        f"2. 🔐 Log in to your Schwab account",
+        f"3. ✅ Click 'Authorize' or 'Allow' when prompted",
+        f"4. ⚠️  Your browser will try to go to {redirect_uri} and show an error",
+        f"5. 📋 COPY the ENTIRE URL from your browser address bar",
+        f"6. 📥 PASTE it below",
+        f"\n" + "=" * 60
+    ])
     
     # Step 2: Get callback URL from user
     print(f"🔄 STEP 2: Get Authorization Code")
@@ -287,7 +396,7 @@ def get_schwab_refresh_token():
     
     # Step 3: Exchange code for tokens
     print(f"\n🔄 STEP 3: Exchange Code for Tokens")
-    tokens = authenticator.exchange_code_for_tokens(auth_code)
+    tokens = asyncio.run(_exchange_and_close(authenticator, auth_code))
     
     if not tokens:
         print("❌ Failed to get tokens. Check your setup and try again.")
@@ -298,23 +407,23 @@ def get_schwab_refresh_token():
     saved = authenticator.save_tokens_to_env(tokens)
     
     if saved:
-        print(f"\n🎉 SUCCESS! Schwab API setup complete!")
-        print(f"\n📋 WHAT'S NEXT:")
-        print(f"   1. ✅ Your tokens are saved in .env file")
-        print(f"   2. 🔧 Update your Factor Monitoring System to use Schwab API")
-        print(f"   3. 📊 Test the connection with your new credentials")
-        
-        # Display next steps for integration
-        print(f"\n🔧 INTEGRATION STEPS:")
-        print(f"   Add to your Python code:")
-        print(f"   ```python")
-        print(f"   from dotenv import load_dotenv")
-        print(f"   import os")
-        print(f"   ")
-        print(f"   load_dotenv()")
-        print(f"   schwab_client_id = os.getenv('SCHWAB_CLIENT_ID')")
-        print(f"   schwab_refresh_token = os.getenv('SCHWAB_REFRESH_TOKEN')")
-        print(f"   ```")
+        _emit([
+            f"\n🎉 SUCCESS! Schwab API setup complete!",
+            f"\n📋 WHAT'S NEXT:",
+            f"   1. ✅ Your tokens are saved in .env file",
+            f"   2. 🔧 Update your Factor Monitoring System to use Schwab API",
+            f"   3. 📊 Test the connection with your new credentials",
+            f"\n🔧 INTEGRATION STEPS:",
+            f"   Add to your Python code:",
+            f"   ```python",
+            f"   from dotenv import load_dotenv",
+            f"   import os",
+            f"   ",
+            f"   load_dotenv()",
+            f"   schwab_client_id = os.getenv('SCHWAB_CLIENT_ID')",
+            f"   schwab_refresh_token = os.getenv('SCHWAB_REFRESH_TOKEN')",
+            f"   ```"
+        ])
         
         return True
     else:
@@ -327,8 +436,7 @@ def test_saved_credentials():
     print("=" * 40)
     
     try:
-        from dotenv import load_dotenv
-        load_dotenv()
+        _ensure_env_loaded()
         
         client_id = os.getenv('SCHWAB_CLIENT_ID')
         refresh_token = os.getenv('SCHWAB_REFRESH_TOKEN')
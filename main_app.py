@@ -5,9 +5,9 @@ Main application that ties everything together
 """
 
 import time
-import schedule
 from datetime import datetime
 import logging
+from logging.handlers import RotatingFileHandler
 from factor_data_collector import SimpleFactorCollector
 from simple_email_system import SimpleEmailSystem
 
@@ -19,12 +19,16 @@ class SimpleFactorMonitor:
         self.email_system = SimpleEmailSystem()
         self.running = False
         
+        # (date, hour) of the last successful routine, guards duplicate runs
+        self._last_key = None
+        
         # Set up logging
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
             handlers=[
-                logging.FileHandler('factor_monitor.log'),
+                # Bounded log growth: 50MB per file, 5 rotated copies
+                RotatingFileHandler('factor_monitor.log', maxBytes=50 * 1024 * 1024, backupCount=5),
                 logging.StreamHandler()
             ]
         )
@@ -32,6 +36,12 @@ class SimpleFactorMonitor:
     
     def run_daily_routine(self):
         """Run the daily monitoring routine"""
+        now = datetime.now()
+        key = (now.date(), now.hour)
+        if key == self._last_key:
+            self.logger.info("Daily routine already ran this hour - skipping")
+            return True
+        
         try:
             print("\n" + "="*60)
             print(f"🚀 DAILY FACTOR ROUTINE - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -57,6 +67,7 @@ class SimpleFactorMonitor:
             else:
                 print("⚠️  Daily routine completed with email issues")
             
+            self._last_key = key
             return True
             
         except Exception as e:
@@ -66,6 +77,8 @@ class SimpleFactorMonitor:
     
     def schedule_operations(self):
         """Schedule automated operations"""
+        import schedule  # only needed once automated monitoring starts
+        
         # Schedule daily report at market close + 1 hour (5:00 PM EST)
         schedule.every().day.at("17:00").do(self.run_daily_routine)
         
@@ -119,10 +132,13 @@ class SimpleFactorMonitor:
         print("📊 System will run scheduled updates automatically")
         print("⏹️  Press Ctrl+C to stop")
         
+        import schedule
+        
         try:
             while self.running:
                 schedule.run_pending()
-                time.sleep(60)  # Check every minute
+                # Sleep until the next job is due instead of polling every minute
+                time.sleep(max(1, schedule.idle_seconds() or 60))
                 
         except KeyboardInterrupt:
             print("\n\n⏹️  Shutdown requested...")
@@ -4,11 +4,43 @@ Factor Monitoring System - Maintenance Scripts
 """
 import sqlite3
 import os
-import shutil
+import sys
+import heapq
+from pathlib import Path
 from datetime import datetime, timedelta
-import pandas as pd
 import argparse
 
+# Same journal/sync settings as the collectors, plus mmap/cache for bulk scans
+MAINTENANCE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+"""
+
+# Indexes backing the date-filtered report/cleanup queries, keyed by table.
+# factor_prices / factor_returns are already covered by their (date, symbol) primary keys.
+INDEX_STMTS = [
+    ('alerts_log', "CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts_log(timestamp)"),
+    ('alerts_log', "CREATE INDEX IF NOT EXISTS idx_alerts_log_sev_ts ON alerts_log(severity, timestamp)"),
+    ('attribution_results', "CREATE INDEX IF NOT EXISTS idx_attribution_created ON attribution_results(created_date)"),
+]
+
+def _ensure_indexes(conn):
+    """Create any missing maintenance indexes on tables that exist"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, stmt in INDEX_STMTS:
+        if table in existing:
+            conn.execute(stmt)
+    conn.commit()
+
+def _open(db_path):
+    """Open a maintenance connection with the pragmas applied (outside any transaction)"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(MAINTENANCE_PRAGMAS)
+    return conn
+
 def backup_database(db_path="factor_monitoring_production.db"):
     """Create database backup"""
     try:
@@ -18,17 +50,32 @@ def backup_database(db_path="factor_monitoring_production.db"):
         os.makedirs(backup_dir, exist_ok=True)
         
         backup_path = os.path.join(backup_dir, f"factor_monitoring_backup_{timestamp}.db")
-        shutil.copy2(db_path, backup_path)
+        
+        # sqlite3.connect would create an empty file, so fail like copy2 did
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Database not found: {db_path}")
+        
+        # Online backup API: consistent snapshot even while the app is writing
+        src = sqlite3.connect(db_path)
+        dst = sqlite3.connect(backup_path)
+        try:
+            with dst:
+                src.backup(dst, pages=1000, sleep=0.05)
+        finally:
+            dst.close()
+            src.close()
         
         print(f"✅ Database backed up to: {backup_path}")
         
         # Cleanup old backups (keep last 30)
-        backup_files = sorted([f for f in os.listdir(backup_dir) if f.startswith("factor_monitoring_backup_")])
+        backup_files = list(Path(backup_dir).glob("factor_monitoring_backup_*.db"))
         
-        if len(backup_files) > 30:
-            for old_backup in backup_files[:-30]:
-                os.remove(os.path.join(backup_dir, old_backup))
-                print(f"🗑️ Removed old backup: {old_backup}")
+        # Names embed the timestamp, so the smallest names are the oldest backups
+        excess = len(backup_files) - 30
+        if excess > 0:
+            for old_backup in heapq.nsmallest(excess, backup_files, key=lambda p: p.name):
+                old_backup.unlink()
+                print(f"🗑️ Removed old backup: {old_backup.name}")
         
         return True
         
@@ -41,7 +88,7 @@ def cleanup_old_data(db_path="factor_monitoring_production.db", days=365):
     try:
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
-        conn = sqlite3.connect(db_path)
+        conn = _open(db_path)
         cursor = conn.cursor()
         
         # Tables to clean with their date columns
@@ -55,10 +102,8 @@ def cleanup_old_data(db_path="factor_monitoring_production.db", days=365):
         total_deleted = 0
         
         for table, date_column in cleanup_tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE date({date_column}) < ?", (cutoff_date,))
-            count_before = cursor.fetchone()[0]
-            
-            cursor.execute(f"DELETE FROM {table} WHERE date({date_column}) < ?", (cutoff_date,))
+            # Raw ISO comparison (no date() wrapper) so an index on the column can be used
+            cursor.execute(f"DELETE FROM {table} WHERE {date_column} < ?", (cutoff_date,))
             deleted = cursor.rowcount
             total_deleted += deleted
             
@@ -77,9 +122,12 @@ def cleanup_old_data(db_path="factor_monitoring_production.db", days=365):
 def optimize_database(db_path="factor_monitoring_production.db"):
     """Optimize database performance"""
     try:
-        conn = sqlite3.connect(db_path)
+        conn = _open(db_path)
         cursor = conn.cursor()
         
+        # Create any missing indexes first so ANALYZE gathers statistics for them
+        _ensure_indexes(conn)
+        
         # Vacuum database
         cursor.execute("VACUUM")
         
@@ -98,7 +146,7 @@ def optimize_database(db_path="factor_monitoring_production.db"):
 def generate_system_report(db_path="factor_monitoring_production.db"):
     """Generate system health report"""
     try:
-        conn = sqlite3.connect(db_path)
+        conn = _open(db_path)
         
         report = {
             'timestamp': datetime.now().isoformat(),
@@ -107,27 +155,28 @@ def generate_system_report(db_path="factor_monitoring_production.db"):
         
         # Count records in each table
         tables = ['factor_prices', 'factor_returns', 'alerts_log', 'trade_records', 'attribution_results']
+        cursor = conn.cursor()
         
-        for table in tables:
-            try:
-                df = pd.read_sql_query(f"SELECT COUNT(*) as count FROM {table}", conn)
-                report[f'{table}_count'] = df.iloc[0]['count']
-            except:
-                report[f'{table}_count'] = 0
-        
-        # Recent activity
-        recent_alerts = pd.read_sql_query("""
-            SELECT COUNT(*) as count FROM alerts_log 
-            WHERE date(timestamp) >= date('now', '-7 days')
-        """, conn)
-        report['alerts_last_7_days'] = recent_alerts.iloc[0]['count']
-        
-        # System errors
-        error_alerts = pd.read_sql_query("""
-            SELECT COUNT(*) as count FROM alerts_log 
-            WHERE severity = 'HIGH' AND date(timestamp) >= date('now', '-7 days')
-        """, conn)
-        report['high_priority_alerts_7_days'] = error_alerts.iloc[0]['count']
+        # Missing tables report 0, so only union the ones that exist
+        existing = {row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )}
+        report.update({f'{table}_count': 0 for table in tables})
+        
+        counted = [table for table in tables if table in existing]
+        if counted:
+            sql = " UNION ALL ".join(f"SELECT '{t}', COUNT(*) FROM {t}" for t in counted)
+            for table, count in cursor.execute(sql).fetchall():
+                report[f'{table}_count'] = count
+        
+        # Recent activity and system errors in one pass
+        recent, high = cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(CASE WHEN severity = 'HIGH' THEN 1 ELSE 0 END), 0)
+            FROM alerts_log 
+            WHERE timestamp >= date('now', '-7 days')
+        """).fetchone()
+        report['alerts_last_7_days'] = recent
+        report['high_priority_alerts_7_days'] = high
         
         conn.close()
         
@@ -153,25 +202,27 @@ def generate_system_report(db_path="factor_monitoring_production.db"):
 
 def check_system_health():
     """Perform comprehensive system health check"""
-    print("🏥 SYSTEM HEALTH CHECK")
-    print("=" * 40)
+    # Collect the report and write it once at the end
+    out = []
+    out.append("🏥 SYSTEM HEALTH CHECK")
+    out.append("=" * 40)
     
     health_status = {'overall': True, 'issues': []}
     
     # Check database
     db_path = "factor_monitoring_production.db"
     if os.path.exists(db_path):
-        print("✅ Database: Present")
+        out.append("✅ Database: Present")
         
         # Check database size
         db_size_mb = os.path.getsize(db_path) / 1024 / 1024
         if db_size_mb > 1000:  # 1GB
-            print(f"⚠️  Database size: {db_size_mb:.2f} MB (Consider cleanup)")
+            out.append(f"⚠️  Database size: {db_size_mb:.2f} MB (Consider cleanup)")
             health_status['issues'].append(f"Large database: {db_size_mb:.2f} MB")
         else:
-            print(f"✅ Database size: {db_size_mb:.2f} MB")
+            out.append(f"✅ Database size: {db_size_mb:.2f} MB")
     else:
-        print("❌ Database: Missing")
+        out.append("❌ Database: Missing")
         health_status['overall'] = False
         health_status['issues'].append("Database missing")
     
@@ -181,12 +232,12 @@ def check_system_health():
         if os.path.exists(log_file):
             log_size = os.path.getsize(log_file) / 1024 / 1024  # MB
             if log_size > 100:  # 100MB
-                print(f"⚠️  {log_file}: {log_size:.2f} MB (Consider rotation)")
+                out.append(f"⚠️  {log_file}: {log_size:.2f} MB (Consider rotation)")
                 health_status['issues'].append(f"Large log file: {log_file}")
             else:
-                print(f"✅ {log_file}: {log_size:.2f} MB")
+                out.append(f"✅ {log_file}: {log_size:.2f} MB")
         else:
-            print(f"⚠️  {log_file}: Not found")
+            out.append(f"⚠️  {log_file}: Not found")
     
     # Check disk space
     try:
@@ -195,32 +246,33 @@ def check_system_health():
         free_gb = free / (1024**3)
         
         if free_gb < 1:  # Less than 1GB free
-            print(f"❌ Disk space: {free_gb:.2f} GB free (Critical)")
+            out.append(f"❌ Disk space: {free_gb:.2f} GB free (Critical)")
             health_status['overall'] = False
             health_status['issues'].append(f"Low disk space: {free_gb:.2f} GB")
         elif free_gb < 5:  # Less than 5GB free
-            print(f"⚠️  Disk space: {free_gb:.2f} GB free (Warning)")
+            out.append(f"⚠️  Disk space: {free_gb:.2f} GB free (Warning)")
             health_status['issues'].append(f"Low disk space: {free_gb:.2f} GB")
         else:
-            print(f"✅ Disk space: {free_gb:.2f} GB free")
+            out.append(f"✅ Disk space: {free_gb:.2f} GB free")
             
     except Exception as e:
-        print(f"❌ Disk space check failed: {e}")
+        out.append(f"❌ Disk space check failed: {e}")
         health_status['issues'].append("Disk space check failed")
     
     # Overall status
-    print("\n" + "=" * 40)
+    out.append("\n" + "=" * 40)
     if health_status['overall'] and not health_status['issues']:
-        print("🎉 SYSTEM HEALTH: EXCELLENT")
+        out.append("🎉 SYSTEM HEALTH: EXCELLENT")
     elif health_status['overall']:
-        print("⚠️  SYSTEM HEALTH: GOOD (Minor issues)")
+        out.append("⚠️  SYSTEM HEALTH: GOOD (Minor issues)")
         for issue in health_status['issues']:
-            print(f"   - {issue}")
+            out.append(f"   - {issue}")
     else:
-        print("❌ SYSTEM HEALTH: CRITICAL")
+        out.append("❌ SYSTEM HEALTH: CRITICAL")
         for issue in health_status['issues']:
-            print(f"   - {issue}")
+            out.append(f"   - {issue}")
     
+    sys.stdout.write('\n'.join(out) + '\n')
     return health_status
 
 def main():
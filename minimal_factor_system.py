@@ -10,6 +10,10 @@ import numpy as np
 from datetime import datetime, timedelta
 import sqlite3
 import os
+import re
+import atexit
+from string import Template
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import smtplib
 from email.mime.text import MIMEText
@@ -17,9 +21,77 @@ from email.mime.multipart import MIMEMultipart
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import requests_cache
+except ImportError:  # requests-cache is optional
+    requests_cache = None
+
+# yfinance 0.2.54+ rejects any session that isn't curl_cffi (YFDataException), so
+# a requests-cache session can only be handed to older releases (unknown version: don't)
+_YF_VERSION = tuple(int(part) for part in re.findall(r'\d+', getattr(yf, '__version__', ''))[:3])
+YF_ACCEPTS_REQUESTS_SESSION = bool(_YF_VERSION) and _YF_VERSION < (0, 2, 54)
+
+# Static parts of the email report, built once at import
+EMAIL_CSS = """
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                .header { background: #2c3e50; color: white; padding: 15px; text-align: center; }
+                .factor-table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+                .factor-table th, .factor-table td { 
+                    border: 1px solid #ddd; 
+                    padding: 12px; 
+                    text-align: left; 
+                }
+                .factor-table th { background-color: #3498db; color: white; }
+                .positive { color: #27ae60; font-weight: bold; }
+                .negative { color: #e74c3c; font-weight: bold; }
+                .alert-high { background: #ffebee; padding: 10px; margin: 5px 0; border-left: 4px solid #e74c3c; }
+                .alert-medium { background: #fff3e0; padding: 10px; margin: 5px 0; border-left: 4px solid #f39c12; }
+"""
+
+EMAIL_HEADER_TMPL = Template("""
+        <html>
+        <head>
+            <style>$css
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>📊 Factor Monitoring Report</h1>
+                <p>$generated</p>
+            </div>
+            
+            <h2>💹 Factor Performance</h2>
+            <table class="factor-table">
+                <tr>
+                    <th>Factor</th>
+                    <th>Symbol</th>
+                    <th>Price</th>
+                    <th>Daily Return</th>
+                </tr>
+        """)
+
+EMAIL_FOOTER = """
+            <hr>
+            <p><em>Generated by Minimal Factor Monitoring System</em></p>
+        </body>
+        </html>
+        """
+
 class MinimalFactorSystem:
     """Minimal factor monitoring system that definitely works"""
     
+    # Statements reused on every store_data call
+    INSERT_FACTOR_SQL = """
+        INSERT OR REPLACE INTO factor_data 
+        (date, symbol, price, daily_return) 
+        VALUES (?, ?, ?, ?)
+    """
+    INSERT_ALERT_SQL = """
+        INSERT INTO alerts 
+        (timestamp, message, severity) 
+        VALUES (?, ?, ?)
+    """
+    
     def __init__(self):
         self.db_path = "minimal_factor_data.db"
         self.factor_etfs = {
@@ -39,11 +111,34 @@ class MinimalFactorSystem:
         self.recipients = os.getenv('FACTOR_RECIPIENTS', '').split(',')
         self.recipients = [r.strip() for r in self.recipients if r.strip()]
         
+        # HTTP cache for yfinance so intraday reruns reuse identical 5-day histories;
+        # newer yfinance keeps its own curl_cffi session, so no cache there
+        self.session = None
+        if requests_cache is not None and YF_ACCEPTS_REQUESTS_SESSION:
+            self.session = requests_cache.CachedSession(
+                'yfinance.cache', backend='sqlite', expire_after=timedelta(minutes=15)
+            )
+        
+        # One connection for the life of the system (page cache stays warm)
+        self._conn = self._connect()
+        atexit.register(self._conn.close)
+        
         self.setup_database()
     
+    def _connect(self):
+        """Open the database connection with the write-path pragmas applied"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        
+        # WAL is persistent on the file; synchronous/temp_store/cache are per connection
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
+        return conn
+    
     def setup_database(self):
         """Setup minimal database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._conn
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -64,10 +159,32 @@ class MinimalFactorSystem:
             )
         ''')
         
+        # Per-symbol history and "latest N alerts" lookups seek instead of scanning
+        existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_factor_symbol_date ON factor_data(symbol, date DESC)
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts(timestamp DESC)
+        ''')
+        
         conn.commit()
-        conn.close()
+        
+        # Give the planner statistics only when an index was just created, not on every start
+        if not {'idx_factor_symbol_date', 'idx_alerts_ts'} <= existing:
+            cursor.execute("ANALYZE")
         print("✅ Database setup complete")
     
+    def _fetch_history(self, symbol):
+        """Fetch one ticker's recent history (used for symbols the batch download missed)"""
+        try:
+            return symbol, yf.Ticker(symbol, session=self.session).history(period="5d")
+        except Exception as e:
+            print(f"   ❌ Error fetching {symbol}: {e}")
+            return symbol, None
+    
     def collect_factor_data(self):
         """Collect current factor data"""
         print("📊 Collecting factor data...")
@@ -75,33 +192,52 @@ class MinimalFactorSystem:
         data = {}
         alerts = []
         
+        # One multi-symbol request instead of a round-trip per ETF
+        symbols = list(self.factor_etfs.values())
+        print(f"   Fetching {len(symbols)} factor ETFs in one batch...")
+        try:
+            raw = yf.download(symbols, period="5d", group_by='ticker', threads=True,
+                              progress=False, auto_adjust=True, session=self.session)
+        except Exception as e:
+            print(f"   ❌ Batch download failed: {e}")
+            raw = pd.DataFrame()
+        
+        fetched = set(raw.columns.get_level_values(0)) if not raw.empty else set()
+        
+        # Rows are the union of all tickers' dates, so drop each ticker's gaps
+        closes_by_symbol = {}
+        for symbol in symbols:
+            if symbol in fetched:
+                closes = raw[symbol]['Close'].dropna()
+                if not closes.empty:
+                    closes_by_symbol[symbol] = closes
+        
+        # Anything the batch missed is fetched per ticker, concurrently
+        missing = [symbol for symbol in symbols if symbol not in closes_by_symbol]
+        if missing:
+            print(f"   Fetching {len(missing)} missing symbol(s) individually...")
+            with ThreadPoolExecutor(max_workers=min(8, len(missing))) as executor:
+                for symbol, hist in executor.map(self._fetch_history, missing):
+                    if hist is not None and not hist.empty:
+                        closes_by_symbol[symbol] = hist['Close']
+        
         for factor_name, symbol in self.factor_etfs.items():
             try:
-                print(f"   Fetching {factor_name} ({symbol})...")
+                closes = closes_by_symbol.get(symbol)
                 
-                ticker = yf.Ticker(symbol)
-                hist = ticker.history(period="5d")
-                
-                if not hist.empty:
-                    latest_price = float(hist['Close'].iloc[-1])
-                    daily_return = float(hist['Close'].pct_change().iloc[-1])
+                if closes is not None:
+                    # Only the last two closes matter; no pct_change over the whole window
+                    prices = closes.to_numpy()
+                    latest_price = float(prices[-1])
+                    daily_return = float(prices[-1] / prices[-2] - 1.0) if len(prices) > 1 else float('nan')
                     
                     data[factor_name] = {
                         'symbol': symbol,
                         'price': latest_price,
                         'daily_return': daily_return,
-                        'date': hist.index[-1].strftime('%Y-%m-%d')
+                        'date': closes.index[-1].strftime('%Y-%m-%d')
                     }
                     
-                    # Generate alerts for large moves
-                    if abs(daily_return) > 0.025:  # 2.5% threshold
-                        severity = "HIGH" if abs(daily_return) > 0.04 else "MEDIUM"
-                        alerts.append({
-                            'factor': factor_name,
-                            'message': f"{factor_name} moved {daily_return:+.2%} today",
-                            'severity': severity
-                        })
-                    
                     print(f"   ✅ {factor_name}: ${latest_price:.2f} ({daily_return:+.2%})")
                 else:
                     print(f"   ❌ No data for {symbol}")
@@ -109,6 +245,20 @@ class MinimalFactorSystem:
             except Exception as e:
                 print(f"   ❌ Error fetching {symbol}: {e}")
         
+        # Generate alerts for large moves: one vectorized threshold pass over all factors
+        names = list(data)
+        returns = np.fromiter((data[name]['daily_return'] for name in names), dtype=float, count=len(names))
+        abs_returns = np.abs(returns)
+        mask_any = abs_returns > 0.025  # 2.5% threshold
+        mask_high = abs_returns > 0.04
+        
+        for i in np.flatnonzero(mask_any):
+            alerts.append({
+                'factor': names[i],
+                'message': f"{names[i]} moved {returns[i]:+.2%} today",
+                'severity': "HIGH" if mask_high[i] else "MEDIUM"
+            })
+        
         # Store data
         self.store_data(data, alerts)
         
@@ -116,102 +266,61 @@ class MinimalFactorSystem:
     
     def store_data(self, data, alerts):
         """Store data in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._conn
         
-        # Store factor data
-        for factor_name, info in data.items():
-            cursor.execute("""
-                INSERT OR REPLACE INTO factor_data 
-                (date, symbol, price, daily_return) 
-                VALUES (?, ?, ?, ?)
-            """, (info['date'], info['symbol'], info['price'], info['daily_return']))
-        
-        # Store alerts
-        for alert in alerts:
-            cursor.execute("""
-                INSERT INTO alerts 
-                (timestamp, message, severity) 
-                VALUES (?, ?, ?)
-            """, (datetime.now().isoformat(), alert['message'], alert['severity']))
+        factor_rows = [
+            (info['date'], info['symbol'], info['price'], info['daily_return'])
+            for info in data.values()
+        ]
+        
+        timestamp = datetime.now().isoformat()
+        alert_rows = [(timestamp, alert['message'], alert['severity']) for alert in alerts]
+        
+        # One transaction for both batches; commits on exit, rolls back on error
+        with conn:
+            conn.executemany(self.INSERT_FACTOR_SQL, factor_rows)
+            conn.executemany(self.INSERT_ALERT_SQL, alert_rows)
         
-        conn.commit()
-        conn.close()
         print("✅ Data stored in database")
     
     def create_email_report(self, data, alerts):
         """Create HTML email report"""
-        html_content = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .header {{ background: #2c3e50; color: white; padding: 15px; text-align: center; }}
-                .factor-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                .factor-table th, .factor-table td {{ 
-                    border: 1px solid #ddd; 
-                    padding: 12px; 
-                    text-align: left; 
-                }}
-                .factor-table th {{ background-color: #3498db; color: white; }}
-                .positive {{ color: #27ae60; font-weight: bold; }}
-                .negative {{ color: #e74c3c; font-weight: bold; }}
-                .alert-high {{ background: #ffebee; padding: 10px; margin: 5px 0; border-left: 4px solid #e74c3c; }}
-                .alert-medium {{ background: #fff3e0; padding: 10px; margin: 5px 0; border-left: 4px solid #f39c12; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>📊 Factor Monitoring Report</h1>
-                <p>{datetime.now().strftime('%Y-%m-%d %H:%M:%S EST')}</p>
-            </div>
-            
-            <h2>💹 Factor Performance</h2>
-            <table class="factor-table">
-                <tr>
-                    <th>Factor</th>
-                    <th>Symbol</th>
-                    <th>Price</th>
-                    <th>Daily Return</th>
-                </tr>
-        """
+        parts = [EMAIL_HEADER_TMPL.substitute(
+            css=EMAIL_CSS,
+            generated=datetime.now().strftime('%Y-%m-%d %H:%M:%S EST')
+        )]
         
         # Add factor data
         for factor_name, info in data.items():
             return_class = 'positive' if info['daily_return'] > 0 else 'negative'
-            html_content += f"""
+            parts.append(f"""
                 <tr>
                     <td><strong>{factor_name}</strong></td>
                     <td>{info['symbol']}</td>
                     <td>${info['price']:.2f}</td>
                     <td class="{return_class}">{info['daily_return']:+.2%}</td>
                 </tr>
-            """
+            """)
         
-        html_content += "</table>"
+        parts.append("</table>")
         
         # Add alerts section
         if alerts:
-            html_content += "<h2>🚨 Active Alerts</h2>"
+            parts.append("<h2>🚨 Active Alerts</h2>")
             
             for alert in alerts:
                 alert_class = f"alert-{alert['severity'].lower()}"
-                html_content += f"""
+                parts.append(f"""
                     <div class="{alert_class}">
                         <strong>{alert['severity']}:</strong> {alert['message']}
                     </div>
-                """
+                """)
         else:
-            html_content += "<h2>✅ No Alerts</h2><p>All factors within normal ranges.</p>"
+            parts.append("<h2>✅ No Alerts</h2><p>All factors within normal ranges.</p>")
         
-        html_content += """
-            <hr>
-            <p><em>Generated by Minimal Factor Monitoring System</em></p>
-        </body>
-        </html>
-        """
+        parts.append(EMAIL_FOOTER)
         
-        return html_content
+        return "".join(parts)
     
     def send_email_report(self, data, alerts):
         """Send email report"""
@@ -240,14 +349,18 @@ class MinimalFactorSystem:
             html_part = MIMEText(html_content, 'html')
             msg.attach(html_part)
             
-            # Send email
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
+            # Send email: implicit TLS (no STARTTLS round-trip), one serialization,
+            # all recipients in a single SMTP transaction
+            raw_message = msg.as_string()
+            server = smtplib.SMTP_SSL('smtp.gmail.com', 465, timeout=30)
             server.login(self.email, self.email_password)
             
+            refused = server.sendmail(self.email, self.recipients, raw_message)
             for recipient in self.recipients:
-                server.sendmail(self.email, recipient, msg.as_string())
-                print(f"   ✅ Sent to {recipient}")
+                if recipient in refused:
+                    print(f"   ❌ Refused by server: {recipient}")
+                else:
+                    print(f"   ✅ Sent to {recipient}")
             
             server.quit()
             print("✅ Email report sent successfully!")
@@ -5,8 +5,12 @@ Compatible with current Dash version
 """
 
 import os
+import atexit
 import sqlite3
+import threading
+import time
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
@@ -17,12 +21,23 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cached components are rebuilt at least this often even when the data hasn't changed (seconds)
+CACHE_TTL = 300
+
 class FactorMonitoringDashboard:
     """Real-time dashboard for factor monitoring system"""
     
     def __init__(self, db_path="factor_monitoring_production.db"):
         self.db_path = db_path
         self.app = None
+        
+        # Read connection opened lazily and reused by every refresh tick
+        self._conn = None
+        self._db_lock = threading.Lock()
+        
+        # (data version, build time, component outputs) from the last refresh
+        self._cache = None
+        
         self.setup_dashboard()
     
     def setup_dashboard(self):
@@ -166,6 +181,32 @@ class FactorMonitoringDashboard:
         def update_dashboard(n):
             return self.update_all_components()
     
+    def _get_connection(self):
+        """Return the shared read connection, opening it on first use"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            
+            # Read-only path: WAL keeps writers from blocking us, mmap skips read() syscalls
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            
+            self._conn = conn
+            atexit.register(conn.close)
+        return self._conn
+    
+    def _data_version(self):
+        """Database change counter, used as the refresh cache key"""
+        if not os.path.exists(self.db_path):
+            return None
+        try:
+            # Bumped whenever another connection commits to any table (snapshots, trades, positions)
+            with self._db_lock:
+                row = self._get_connection().execute("PRAGMA data_version").fetchone()
+            return row[0]
+        except sqlite3.Error:
+            return None
+    
     def get_database_data(self):
         """Get data from database"""
         try:
@@ -173,35 +214,61 @@ class FactorMonitoringDashboard:
                 logger.warning(f"Database not found: {self.db_path}")
                 return self.get_sample_data()
             
-            conn = sqlite3.connect(self.db_path)
-            
-            # Get latest portfolio data
-            portfolio_df = pd.read_sql_query("""
-                SELECT * FROM portfolio_snapshots 
-                ORDER BY timestamp DESC 
-                LIMIT 30
-            """, conn)
-            
-            # Get recent trades
-            trades_df = pd.read_sql_query("""
-                SELECT * FROM trades 
-                ORDER BY timestamp DESC 
-                LIMIT 50
-            """, conn)
-            
-            # Get current positions
-            positions_df = pd.read_sql_query("""
-                SELECT * FROM positions 
-                WHERE quantity != 0
-                ORDER BY market_value DESC
-            """, conn)
-            
-            conn.close()
+            # Callbacks can run on several threads; they share the one connection
+            with self._db_lock:
+                conn = self._get_connection()
+                
+                # Get latest portfolio data
+                portfolio_df = pd.read_sql_query("""
+                    SELECT * FROM portfolio_snapshots 
+                    ORDER BY timestamp DESC 
+                    LIMIT 30
+                """, conn)
+                
+                # Get recent trades
+                trades_df = pd.read_sql_query("""
+                    SELECT * FROM trades 
+                    ORDER BY timestamp DESC 
+                    LIMIT 50
+                """, conn)
+                
+                # Top holdings only; the long tail is summed inside SQLite
+                positions_df = pd.read_sql_query("""
+                    SELECT * FROM positions 
+                    WHERE quantity != 0
+                    ORDER BY market_value DESC
+                    LIMIT 8
+                """, conn)
+                
+                position_count, others_value = conn.execute("""
+                    SELECT
+                        (SELECT COUNT(*) FROM positions WHERE quantity != 0),
+                        (SELECT COALESCE(SUM(market_value), 0) FROM (
+                            SELECT market_value FROM positions 
+                            WHERE quantity != 0
+                            ORDER BY market_value DESC
+                            LIMIT -1 OFFSET 8
+                        ))
+                """).fetchone()
+                
+                # Sector totals aggregated in SQL (older schemas have no sector column)
+                try:
+                    sector_df = pd.read_sql_query("""
+                        SELECT sector, SUM(market_value) AS market_value
+                        FROM positions 
+                        WHERE quantity != 0
+                        GROUP BY sector
+                    """, conn)
+                except Exception:
+                    sector_df = pd.DataFrame()
             
             return {
                 'portfolio': portfolio_df,
                 'trades': trades_df,
-                'positions': positions_df
+                'positions': positions_df,
+                'position_count': position_count,
+                'others_value': others_value,
+                'sectors': sector_df
             }
             
         except Exception as e:
@@ -214,19 +281,17 @@ class FactorMonitoringDashboard:
         
         # Sample portfolio performance
         dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
-        portfolio_data = []
-        value = 1000000
         
-        for date in dates:
-            value += value * np.random.normal(0.0008, 0.02)  # ~20% annual return, 20% volatility
-            portfolio_data.append({
-                'timestamp': date,
-                'total_value': value,
-                'cash': value * 0.05,
-                'positions_value': value * 0.95
-            })
+        # Whole price path in one draw + cumprod (~20% annual return, 20% volatility)
+        returns = np.random.normal(0.0008, 0.02, size=len(dates))
+        values = 1000000 * np.cumprod(1.0 + returns)
         
-        portfolio_df = pd.DataFrame(portfolio_data)
+        portfolio_df = pd.DataFrame({
+            'timestamp': dates,
+            'total_value': values,
+            'cash': values * 0.05,
+            'positions_value': values * 0.95
+        })
         
         # Sample positions
         positions_data = [
@@ -252,11 +317,20 @@ class FactorMonitoringDashboard:
         return {
             'portfolio': portfolio_df,
             'trades': trades_df,
-            'positions': positions_df
+            'positions': positions_df.head(8),
+            'position_count': len(positions_df),
+            'others_value': positions_df['market_value'].iloc[8:].sum(),
+            'sectors': positions_df.groupby('sector', as_index=False)['market_value'].sum()
         }
     
     def update_all_components(self):
         """Update all dashboard components"""
+        # Nothing new since the last tick: reuse the queried data and built figures
+        version = self._data_version()
+        if (version is not None and self._cache is not None and self._cache[0] == version
+                and time.monotonic() - self._cache[1] < CACHE_TTL):
+            return self._cache[2]
+        
         try:
             data = self.get_database_data()
             
@@ -281,23 +355,28 @@ class FactorMonitoringDashboard:
                 portfolio_value = "N/A"
                 daily_pnl = "N/A"
             
-            active_positions = str(len(positions_df))
+            active_positions = str(data['position_count'])
             
             # Charts
             performance_chart = self.create_performance_chart(portfolio_df)
             factor_chart = self.create_factor_exposure_chart()
-            holdings_chart = self.create_holdings_chart(positions_df)
-            sector_chart = self.create_sector_chart(positions_df)
+            holdings_chart = self.create_holdings_chart(positions_df, data['others_value'])
+            sector_chart = self.create_sector_chart(data['sectors'])
             
             # Recent activity
             activity_table = self.create_activity_table(trades_df)
             
-            return (
+            result = (
                 system_status, portfolio_value, active_positions, daily_pnl,
                 performance_chart, factor_chart, holdings_chart, sector_chart,
                 activity_table
             )
             
+            if version is not None:
+                self._cache = (version, time.monotonic(), result)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Update error: {e}")
             # Return safe defaults
@@ -313,9 +392,11 @@ class FactorMonitoringDashboard:
         
         fig = go.Figure()
         
+        # float32 only for the plotted series (halves the JSON payload); the
+        # value/P&L cards read the float64 frame
         fig.add_trace(go.Scatter(
             x=df['timestamp'],
-            y=df['total_value'],
+            y=df['total_value'].to_numpy(dtype=np.float32),
             mode='lines',
             name='Portfolio Value',
             line=dict(color='#1f77b4', width=2)
@@ -359,14 +440,15 @@ class FactorMonitoringDashboard:
         
         return fig
     
-    def create_holdings_chart(self, df):
+    def create_holdings_chart(self, df, others_value=None):
         """Create holdings pie chart"""
         if df.empty:
             return {}
         
-        # Top 8 holdings + others
+        # Top 8 holdings + others (others_value comes pre-summed from SQL when available)
         top_holdings = df.head(8)
-        others_value = df.tail(len(df) - 8)['market_value'].sum() if len(df) > 8 else 0
+        if others_value is None:
+            others_value = df['market_value'].iloc[8:].sum()
         
         labels = list(top_holdings['symbol'])
         values = list(top_holdings['market_value'])
@@ -388,16 +470,14 @@ class FactorMonitoringDashboard:
         
         return fig
     
-    def create_sector_chart(self, df):
-        """Create sector allocation chart"""
-        if df.empty or 'sector' not in df.columns:
+    def create_sector_chart(self, sector_allocation):
+        """Create sector allocation chart from per-sector market value totals"""
+        if sector_allocation.empty or 'sector' not in sector_allocation.columns:
             return {}
         
-        sector_allocation = df.groupby('sector')['market_value'].sum().reset_index()
-        
         fig = go.Figure(data=[go.Bar(
             x=sector_allocation['sector'],
-            y=sector_allocation['market_value'],
+            y=sector_allocation['market_value'].to_numpy(dtype=np.float32),
             text=sector_allocation['market_value'],
             texttemplate='$%{text:,.0f}',
             textposition='auto'
@@ -463,10 +543,6 @@ def main():
     print("🌐 Starting Factor Monitoring Dashboard...")
     
     try:
-        # Import numpy for sample data
-        import numpy as np
-        globals()['np'] = np  # Make np available globally
-        
         # Create and run dashboard
         dashboard = FactorMonitoringDashboard()
         print("📊 Dashboard available at: http://localhost:8050")
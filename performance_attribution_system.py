@@ -4,12 +4,65 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import sqlite3
 import logging
+import functools
+import os
+import threading
 from dataclasses import dataclass
 import json
 from scipy import stats
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+    njit = None
+
+# Applied once at init: WAL journal (persists in the file), fewer fsyncs, in-memory temp, mmap reads
+WRITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Applied to read-only connections used for return queries
+READ_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+def _tilt_kernel(R, w, wn):
+    """Tilted/neutral daily returns and per-factor tilt contributions in one pass over R"""
+    T, F = R.shape
+    tilted = np.zeros(T)
+    neutral = np.zeros(T)
+    contrib = np.zeros(F)
+    for t in range(T):
+        st = 0.0
+        sn = 0.0
+        for f in range(F):
+            r = R[t, f]
+            st += r * w[f]
+            sn += r * wn[f]
+            contrib[f] += r * (w[f] - wn[f])
+        tilted[t] = st
+        neutral[t] = sn
+    return tilted, neutral, contrib
+
+def _db_fingerprint(db_path):
+    """(mtime_ns, size) of the database and its WAL file, which changes whenever data does"""
+    key = ()
+    for path in (db_path, db_path + '-wal'):
+        if os.path.exists(path):
+            st = os.stat(path)
+            key += (st.st_mtime_ns, st.st_size)
+    return key
+
+_tilt_kernel_jit = njit(cache=True, fastmath=True)(_tilt_kernel) if njit else None
+
 @dataclass
 class AttributionResult:
     """Data class for attribution analysis results"""
@@ -30,9 +83,13 @@ class PerformanceAttributionSystem:
     Analyzes returns, risk, and attribution across multiple dimensions
     """
     
-    def __init__(self, db_path: str = "factor_data.db", benchmark: str = "SPY"):
+    def __init__(self, db_path: str = "factor_data.db", benchmark: str = "SPY", precision: str = "fp64"):
         self.db_path = db_path
         self.benchmark = benchmark
+        
+        # Return matrices stay float64 unless 'fp32' is asked for (half the footprint, ~1e-7 relative
+        # rounding per return); weights, products and sums are float64 either way
+        self._dtype = np.float64 if precision == "fp64" else np.float32
         self.logger = logging.getLogger('PerformanceAttribution')
         
         # Factor ETF mappings
@@ -60,12 +117,35 @@ class PerformanceAttributionSystem:
             'Communications': 'XLC'
         }
         
+        # Derived lookups, built once instead of on every attribution call
+        self._factor_order = tuple(self.factor_etfs)
+        self._factor_symbols = tuple(self.factor_etfs.values())
+        self._equal_weights = {factor: 1.0/len(self._factor_order) for factor in self._factor_order}
+        self._returns_params = (*self._factor_symbols, self.benchmark)
+        self._symbol_columns = {symbol: i for i, symbol in enumerate(self._returns_params)}
+        self._return_columns = (*self._factor_order, self.benchmark)
+        
+        # Returns query is formatted once (the symbol count is fixed), and each thread keeps one
+        # read-only connection so sqlite's statement cache skips re-parsing it on every call
+        self._returns_sql = '''
+            SELECT date, symbol, daily_return
+            FROM factor_returns
+            WHERE date BETWEEN ? AND ?
+            AND symbol IN ({})
+        '''.format(','.join('?' * len(self._returns_params)))
+        self._local = threading.local()
+        
+        # Period fetches are memoized per instance, keyed on the window and the database fingerprint
+        self._period_returns = functools.lru_cache(maxsize=64)(self._load_returns)
+        
         self.initialize_attribution_tables()
     
     def initialize_attribution_tables(self):
         """Initialize tables for attribution analysis storage"""
         try:
             conn = sqlite3.connect(self.db_path)
+            for pragma in WRITE_PRAGMAS:
+                conn.execute(pragma)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -98,6 +178,19 @@ class PerformanceAttributionSystem:
                 )
             ''')
             
+            # Period queries seek by symbol then date range and read daily_return from the index itself;
+            # the (date, symbol) primary key covers the other order
+            has_factor_returns = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'factor_returns'"
+            ).fetchone()
+            has_return_index = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_fr_symbol_date_return'"
+            ).fetchone()
+            if has_factor_returns and not has_return_index:
+                cursor.execute("DROP INDEX IF EXISTS idx_fr_symbol_date")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_fr_symbol_date_return ON factor_returns(symbol, date, daily_return)")
+                cursor.execute("ANALYZE factor_returns")
+            
             conn.commit()
             conn.close()
             
@@ -106,57 +199,69 @@ class PerformanceAttributionSystem:
         except Exception as e:
             self.logger.error(f"Failed to initialize attribution tables: {e}")
     
+    def _read_connection(self) -> sqlite3.Connection:
+        """This thread's persistent read-only connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            for pragma in READ_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+    
+    def _load_returns(self, start_date: str, end_date: str, fingerprint=None) -> pd.DataFrame:
+        """Fetch factor and benchmark daily returns in one query, pivoted to date x factor"""
+        # Dates are parsed while reading, so the pivot index is datetime64 straight away
+        returns_df = pd.read_sql_query(self._returns_sql, self._read_connection(),
+                                       params=[start_date, end_date, *self._returns_params],
+                                       parse_dates={'date': '%Y-%m-%d'})
+        
+        if returns_df.empty:
+            return pd.DataFrame()
+        
+        # Scatter rows straight into a date x symbol matrix instead of a hash-based pivot
+        dates, row = np.unique(returns_df['date'].to_numpy(), return_inverse=True)
+        col = returns_df['symbol'].map(self._symbol_columns).to_numpy()
+        R = np.full((len(dates), len(self._return_columns)), np.nan, dtype=self._dtype)
+        R[row, col] = returns_df['daily_return'].to_numpy(dtype=self._dtype)
+        
+        # Columns are factor names plus the benchmark symbol; symbols with no rows are dropped
+        returns_pivot = pd.DataFrame(R, index=pd.DatetimeIndex(dates, name='date'), columns=list(self._return_columns))
+        return returns_pivot.dropna(axis=1, how='all')
+    
+    def data_version(self):
+        """Opaque token that changes whenever the underlying database does"""
+        return _db_fingerprint(self.db_path)
+    
+    def _returns_window(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """Cached factor + benchmark returns for a window (treat as read-only)"""
+        return self._period_returns(start_date, end_date, self.data_version())
+    
     def get_portfolio_returns(self, start_date: str, end_date: str, 
                             weights: Optional[Dict[str, float]] = None) -> pd.DataFrame:
         """Get portfolio returns based on factor allocations"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # Get factor returns
-            query = '''
-                SELECT date, symbol, daily_return
-                FROM factor_returns
-                WHERE date BETWEEN ? AND ?
-                AND symbol IN ({})
-            '''.format(','.join('?' * len(self.factor_etfs.values())))
-            
-            params = [start_date, end_date] + list(self.factor_etfs.values())
-            returns_df = pd.read_sql_query(query, conn, params=params)
-            conn.close()
+            # Factor and benchmark returns come back in the same (cached) query
+            returns_pivot = self._returns_window(start_date, end_date)
+            returns_pivot = returns_pivot.drop(columns=self.benchmark, errors='ignore').dropna(how='all')
             
-            if returns_df.empty:
+            if returns_pivot.empty:
                 self.logger.warning("No return data found for specified period")
                 return pd.DataFrame()
             
-            # Pivot to get factors as columns
-            returns_pivot = returns_df.pivot(index='date', columns='symbol', values='daily_return')
-            returns_pivot.index = pd.to_datetime(returns_pivot.index)
-            
-            # Map symbols back to factor names
-            symbol_to_factor = {v: k for k, v in self.factor_etfs.items()}
-            returns_pivot.columns = [symbol_to_factor.get(col, col) for col in returns_pivot.columns]
-            
             # Apply weights to calculate portfolio returns
             if weights is None:
                 # Equal weight if no weights provided
-                weights = {factor: 1.0/len(self.factor_etfs) for factor in self.factor_etfs.keys()}
+                weights = self._equal_weights
             
-            # Calculate weighted portfolio returns
-            portfolio_returns = pd.Series(index=returns_pivot.index, dtype=float)
-            
-            for date_idx in returns_pivot.index:
-                daily_return = 0.0
-                for factor, weight in weights.items():
-                    if factor in returns_pivot.columns:
-                        factor_return = returns_pivot.loc[date_idx, factor]
-                        if not pd.isna(factor_return):
-                            daily_return += weight * factor_return
-                
-                portfolio_returns[date_idx] = daily_return
+            # Calculate weighted portfolio returns (missing factors/days count as 0)
+            factor_order = list(weights)
+            W = np.fromiter((weights[f] for f in factor_order), dtype=np.float64, count=len(factor_order))
+            R = returns_pivot.reindex(columns=factor_order).to_numpy(dtype=self._dtype, na_value=0.0)
             
             # Create result DataFrame
             result_df = returns_pivot.copy()
-            result_df['Portfolio'] = portfolio_returns
+            result_df['Portfolio'] = pd.Series(R @ W, index=returns_pivot.index)
             
             return result_df
             
@@ -165,28 +270,15 @@ class PerformanceAttributionSystem:
             return pd.DataFrame()
     
     def get_benchmark_returns(self, start_date: str, end_date: str) -> pd.Series:
-        """Get benchmark returns"""
+        """Get benchmark returns (shares the cached fetch with the portfolio returns)"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            returns_pivot = self._returns_window(start_date, end_date)
             
-            query = '''
-                SELECT date, daily_return
-                FROM factor_returns
-                WHERE date BETWEEN ? AND ?
-                AND symbol = ?
-            '''
-            
-            benchmark_df = pd.read_sql_query(query, conn, params=[start_date, end_date, self.benchmark])
-            conn.close()
-            
-            if benchmark_df.empty:
+            if self.benchmark not in returns_pivot.columns:
                 self.logger.warning(f"No benchmark data found for {self.benchmark}")
                 return pd.Series()
             
-            benchmark_series = benchmark_df.set_index('date')['daily_return']
-            benchmark_series.index = pd.to_datetime(benchmark_series.index)
-            
-            return benchmark_series
+            return returns_pivot[self.benchmark].dropna()
             
         except Exception as e:
             self.logger.error(f"Failed to get benchmark returns: {e}")
@@ -203,45 +295,36 @@ class PerformanceAttributionSystem:
         try:
             if benchmark_weights is None:
                 # Assume equal weight benchmark for factors
-                benchmark_weights = {factor: 1.0/len(self.factor_etfs) for factor in self.factor_etfs.keys()}
-            
-            # Calculate period returns
-            portfolio_period_return = (portfolio_returns['Portfolio'] + 1).prod() - 1
-            benchmark_period_return = (benchmark_returns + 1).prod() - 1
-            
-            # Calculate factor period returns
-            factor_period_returns = {}
-            for factor in portfolio_weights.keys():
-                if factor in portfolio_returns.columns:
-                    factor_period_returns[factor] = (portfolio_returns[factor] + 1).prod() - 1
-            
-            # Calculate allocation effect: (wp - wb) * rb
-            allocation_effect = 0.0
-            selection_effect = 0.0
-            interaction_effect = 0.0
-            
-            factor_contributions = {}
-            
-            for factor in portfolio_weights.keys():
-                wp = portfolio_weights[factor]  # Portfolio weight
-                wb = benchmark_weights.get(factor, 0.0)  # Benchmark weight
-                rp = factor_period_returns.get(factor, 0.0)  # Portfolio factor return
-                rb = benchmark_period_return  # Use benchmark return as sector benchmark
-                
-                # Allocation effect: (wp - wb) * rb
-                factor_allocation = (wp - wb) * rb
-                allocation_effect += factor_allocation
-                
-                # Selection effect: wb * (rp - rb)
-                factor_selection = wb * (rp - rb)
-                selection_effect += factor_selection
-                
-                # Interaction effect: (wp - wb) * (rp - rb)
-                factor_interaction = (wp - wb) * (rp - rb)
-                interaction_effect += factor_interaction
-                
-                # Total factor contribution
-                factor_contributions[factor] = factor_allocation + factor_selection + factor_interaction
+                benchmark_weights = self._equal_weights
+            
+            # Calculate period returns (NaN days are skipped)
+            portfolio_period_return = float(np.nanprod(1.0 + portfolio_returns['Portfolio'].to_numpy(), dtype=np.float64) - 1.0)
+            benchmark_period_return = float(np.nanprod(1.0 + benchmark_returns.to_numpy(), dtype=np.float64) - 1.0)
+            
+            # Weight vectors and active weights, built once in portfolio weight order
+            factors = tuple(portfolio_weights)
+            n = len(factors)
+            wp = np.fromiter((portfolio_weights[f] for f in factors), dtype=np.float64, count=n)  # Portfolio weights
+            wb = np.fromiter((benchmark_weights.get(f, 0.0) for f in factors), dtype=np.float64, count=n)  # Benchmark weights
+            dw = wp - wb
+            
+            # Calculate factor period returns in one pass over the return matrix (absent factors -> 0)
+            R = portfolio_returns.reindex(columns=list(factors)).to_numpy(dtype=self._dtype)
+            rp = np.nanprod(1.0 + R, axis=0, dtype=np.float64) - 1.0  # Portfolio factor returns
+            rb = benchmark_period_return  # Use benchmark return as sector benchmark
+            drp = rp - rb
+            
+            # Allocation: (wp - wb) * rb, Selection: wb * (rp - rb), Interaction: (wp - wb) * (rp - rb)
+            alloc = dw * rb
+            sel = wb * drp
+            inter = dw * drp
+            
+            allocation_effect = float(alloc.sum())
+            selection_effect = float(sel.sum())
+            interaction_effect = float(inter.sum())
+            
+            # Total factor contribution
+            factor_contributions = dict(zip(factors, (alloc + sel + inter).tolist()))
             
             excess_return = portfolio_period_return - benchmark_period_return
             
@@ -270,41 +353,23 @@ class PerformanceAttributionSystem:
         Calculate attribution based on factor tilts vs market-cap weighted approach
         """
         try:
-            # Calculate equal-weighted benchmark (neutral factor exposure)
-            equal_weights = {factor: 1.0/len(weights) for factor in weights.keys()}
+            factors = [f for f in weights if f in returns_df.columns]
+            R = returns_df[factors].to_numpy(dtype=self._dtype, na_value=0.0)
+            
+            # Tilted weights vs equal-weighted benchmark (neutral factor exposure)
+            w = np.array([weights[f] for f in factors], dtype=np.float64)
+            wn = np.full_like(w, 1.0/len(weights))
             
             # Calculate returns for both approaches
-            tilted_returns = []
-            neutral_returns = []
-            
-            for date_idx in returns_df.index:
-                tilted_return = 0.0
-                neutral_return = 0.0
-                
-                for factor in weights.keys():
-                    if factor in returns_df.columns:
-                        factor_return = returns_df.loc[date_idx, factor]
-                        if not pd.isna(factor_return):
-                            tilted_return += weights[factor] * factor_return
-                            neutral_return += equal_weights[factor] * factor_return
-                
-                tilted_returns.append(tilted_return)
-                neutral_returns.append(neutral_return)
-            
-            tilted_series = pd.Series(tilted_returns, index=returns_df.index)
-            neutral_series = pd.Series(neutral_returns, index=returns_df.index)
-            
-            # Calculate attribution by factor tilt
-            tilt_attribution = {}
-            
-            for factor in weights.keys():
-                if factor in returns_df.columns:
-                    factor_returns = returns_df[factor]
-                    weight_diff = weights[factor] - equal_weights[factor]
-                    
-                    # Attribution = (actual_weight - neutral_weight) * factor_return
-                    factor_attribution = (factor_returns * weight_diff).sum()
-                    tilt_attribution[factor] = factor_attribution
+            # Attribution = (actual_weight - neutral_weight) * factor_return, summed over dates
+            if _tilt_kernel_jit is not None:
+                tilted, neutral, contrib = _tilt_kernel_jit(np.ascontiguousarray(R), w, wn)
+            else:
+                tilted, neutral, contrib = R @ w, R @ wn, (R * (w - wn)).sum(axis=0, dtype=np.float64)
+            
+            tilted_series = pd.Series(tilted, index=returns_df.index)
+            neutral_series = pd.Series(neutral, index=returns_df.index)
+            tilt_attribution = dict(zip(factors, contrib.tolist()))
             
             total_tilt_effect = sum(tilt_attribution.values())
             
@@ -327,35 +392,94 @@ class PerformanceAttributionSystem:
                                       risk_free_rate: float = 0.02) -> Dict:
         """Calculate comprehensive risk-adjusted performance metrics"""
         try:
-            # Ensure series are aligned
-            aligned_data = pd.DataFrame({
-                'portfolio': portfolio_returns,
-                'benchmark': benchmark_returns
-            }).dropna()
-            
-            if aligned_data.empty:
+            # Align on the portfolio's dates (a no-op when both come from the same fetch)
+            pr = portfolio_returns.to_numpy(dtype=np.float64)
+            if benchmark_returns.index.equals(portfolio_returns.index):
+                br = benchmark_returns.to_numpy(dtype=np.float64)
+            else:
+                br = benchmark_returns.reindex(portfolio_returns.index).to_numpy(dtype=np.float64)
+            
+            mask = np.isfinite(pr) & np.isfinite(br)
+            portfolio_ret = pr[mask]
+            benchmark_ret = br[mask]
+            
+            if portfolio_ret.size == 0:
                 return {}
             
-            portfolio_ret = aligned_data['portfolio']
-            benchmark_ret = aligned_data['benchmark']
-            
             # Basic return metrics
-            portfolio_total_return = (portfolio_ret + 1).prod() - 1
-            benchmark_total_return = (benchmark_ret + 1).prod() - 1
+            portfolio_total_return = np.prod(portfolio_ret + 1) - 1
+            benchmark_total_return = np.prod(benchmark_ret + 1) - 1
             excess_return = portfolio_total_return - benchmark_total_return
             
+            # First and second moments of both series from one pass: sums and the 2x2 Gram matrix
+            X = np.stack([portfolio_ret, benchmark_ret])
+            n = X.shape[1]
+            sum_p, sum_b = X.sum(axis=1)
+            gram = X @ X.T
+            sum_pp, sum_pb, sum_bb = gram[0, 0], gram[0, 1], gram[1, 1]
+            mean_p, mean_b = sum_p / n, sum_b / n
+            denom = n - 1 if n > 1 else np.nan  # sample (ddof=1) moments
+            var_p = max(sum_pp - n * mean_p * mean_p, 0.0) / denom
+            var_b = max(sum_bb - n * mean_b * mean_b, 0.0) / denom
+            cov_pb = (sum_pb - n * mean_p * mean_b) / denom
+            
             # Risk metrics
-            portfolio_vol = portfolio_ret.std() * np.sqrt(252)  # Annualized
-            benchmark_vol = benchmark_ret.std() * np.sqrt(252)
+            portfolio_vol = np.sqrt(var_p * 252)  # Annualized
+            benchmark_vol = np.sqrt(var_b * 252)
             
-            # Tracking error
-            tracking_error = (portfolio_ret - benchmark_ret).std() * np.sqrt(252)
+            # Tracking error: var(p - b) = var(p) + var(b) - 2 cov(p, b)
+            tracking_error = np.sqrt(max(var_p + var_b - 2 * cov_pb, 0.0) * 252)
             
             # Information ratio
-            avg_excess_return = (portfolio_ret - benchmark_ret).mean() * 252
+            avg_excess_return = (mean_p - mean_b) * 252
             information_ratio = avg_excess_return / tracking_error if tracking_error != 0 else 0
             
             # Sharpe ratios
             daily_rf = risk_free_rate / 252
-            portfolio_sharpe = ((portfolio_ret - daily_rf).mean() * 252) / portfolio_vol if portfolio_vol != 0 else 0
-            benchmark_sharpe = ((benchmark_ret - daily_rf).mean() * 252) / benchmark_vol if benchmark_vol != 0 else 0
+            portfolio_sharpe = ((mean_p - daily_rf) * 252) / portfolio_vol if portfolio_vol != 0 else 0
+            benchmark_sharpe = ((mean_b - daily_rf) * 252) / benchmark_vol if benchmark_vol != 0 else 0
+            
+            return {
+                'portfolio_total_return': float(portfolio_total_return),
+                'benchmark_total_return': float(benchmark_total_return),
+                'excess_return': float(excess_return),
+                'portfolio_volatility': float(portfolio_vol),
+                'benchmark_volatility': float(benchmark_vol),
+                'tracking_error': float(tracking_error),
+                'information_ratio': float(information_ratio),
+                'portfolio_sharpe': float(portfolio_sharpe),
+                'benchmark_sharpe': float(benchmark_sharpe)
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Risk metrics calculation failed: {e}")
+            return {}
+    
+    def generate_comprehensive_attribution_report(self, start_date: str, end_date: str,
+                                                  portfolio_weights: Dict[str, float],
+                                                  benchmark_weights: Optional[Dict[str, float]] = None) -> Optional[AttributionResult]:
+        """Run Brinson and risk attribution for a period"""
+        portfolio_returns = self.get_portfolio_returns(start_date, end_date, portfolio_weights)
+        benchmark_returns = self.get_benchmark_returns(start_date, end_date)
+        
+        if portfolio_returns.empty or benchmark_returns.empty:
+            self.logger.warning("Insufficient data for attribution report")
+            return None
+        
+        brinson = self.calculate_brinson_attribution(portfolio_returns, benchmark_returns,
+                                                     portfolio_weights, benchmark_weights)
+        if not brinson:
+            return None
+        
+        return AttributionResult(
+            period=f"{start_date} to {end_date}",
+            total_return=brinson['total_return'],
+            benchmark_return=brinson['benchmark_return'],
+            excess_return=brinson['excess_return'],
+            factor_contributions=brinson['factor_contributions'],
+            sector_contributions={},
+            selection_effect=brinson['selection_effect'],
+            allocation_effect=brinson['allocation_effect'],
+            interaction_effect=brinson['interaction_effect'],
+            risk_adjusted_metrics=self.calculate_risk_adjusted_metrics(portfolio_returns['Portfolio'], benchmark_returns)
+        )
@@ -10,6 +10,18 @@ from dataclasses import dataclass, asdict
 from pathlib import Path
 import shutil
 
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+def dumps(obj) -> str:
+    """Serialize a record payload to a JSON string (orjson when available)"""
+    if orjson is not None:
+        # Naive datetimes here are local time, so they are written without an offset (as str() does)
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, default=str)
+
 @dataclass
 class TradeRecord:
     """Data class for trade record structure"""
@@ -278,8 +290,8 @@ class FactorRecordKeeping:
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 decision.timestamp, decision.decision_id, decision.decision_type,
-                json.dumps(decision.factors_affected), decision.rationale,
-                json.dumps(decision.supporting_data), decision.expected_outcome,
+                dumps(decision.factors_affected), decision.rationale,
+                dumps(decision.supporting_data), decision.expected_outcome,
                 decision.actual_outcome, decision.user_id, hash_sig
             ))
             
@@ -315,9 +327,9 @@ class FactorRecordKeeping:
             ''', (
                 assessment.timestamp, assessment.assessment_id, assessment.portfolio_beta,
                 assessment.var_95, assessment.max_drawdown, 
-                json.dumps(assessment.factor_concentration),
-                json.dumps(assessment.correlation_matrix), assessment.regime_assessment,
-                assessment.risk_level, json.dumps(assessment.recommendations), hash_sig
+                dumps(assessment.factor_concentration),
+                dumps(assessment.correlation_matrix), assessment.regime_assessment,
+                assessment.risk_level, dumps(assessment.recommendations), hash_sig
             ))
             
             conn.commit()
@@ -351,10 +363,10 @@ class FactorRecordKeeping:
                 ) VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 today, portfolio_data.get('total_value', 0),
-                json.dumps(portfolio_data.get('factor_allocations', {})),
-                json.dumps(portfolio_data.get('performance_metrics', {})),
-                json.dumps(portfolio_data.get('benchmark_comparison', {})),
-                json.dumps(portfolio_data.get('market_conditions', {})),
+                dumps(portfolio_data.get('factor_allocations', {})),
+                dumps(portfolio_data.get('performance_metrics', {})),
+                dumps(portfolio_data.get('benchmark_comparison', {})),
+                dumps(portfolio_data.get('market_conditions', {})),
                 hash_sig
             ))
             
@@ -16,6 +16,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import warnings
 import requests
+from requests.adapters import HTTPAdapter
 import base64
 import json
 warnings.filterwarnings('ignore')
@@ -32,6 +33,11 @@ class SchwabAPI:
         self.token_expiry = None
         self.base_url = "https://api.schwabapi.com"
         
+        # Keep-alive session so TCP/TLS handshakes are reused across calls
+        self._session = requests.Session()
+        self._session.headers['Accept'] = 'application/json'
+        self._session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        
     def get_access_token(self):
         """Get access token using refresh token"""
         if not self.client_id or not self.client_secret or not self.refresh_token:
@@ -56,7 +62,7 @@ class SchwabAPI:
             encoded_credentials = base64.b64encode(credentials.encode()).decode()
             headers['Authorization'] = f"Basic {encoded_credentials}"
             
-            response = requests.post(token_url, data=token_data, headers=headers, timeout=30)
+            response = self._session.post(token_url, data=token_data, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 tokens = response.json()
@@ -93,7 +99,7 @@ class SchwabAPI:
             }
             params = {'symbols': symbols}
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._session.get(url, headers=headers, params=params, timeout=10)
             
             if response.status_code == 200:
                 return response.json()
@@ -116,7 +122,7 @@ class SchwabAPI:
                 'Accept': 'application/json'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self._session.get(url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 return response.json()
@@ -140,7 +146,7 @@ class SchwabAPI:
             }
             params = {'fields': 'positions'}
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._session.get(url, headers=headers, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -1,4 +1,5 @@
 import smtplib
+from unittest import mock
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -31,5 +32,26 @@ def test_email_setup():
         print(f"❌ Email test failed: {e}")
         return False
 
+def test_permanent_rejection_not_retried():
+    """A 5xx rejection is sent once, not retried over a fresh session"""
+    from email_alert_system import EmailConfig, FactorAlertSystem
+    
+    config = EmailConfig(sender_email="sender@example.com", sender_password="secret",
+                         recipient_emails=["recipient@example.com"])
+    
+    with mock.patch('smtplib.SMTP_SSL') as smtp_ssl:
+        server = smtp_ssl.return_value
+        server.sendmail.side_effect = smtplib.SMTPDataError(550, b"mailbox unavailable")
+        
+        alerts = FactorAlertSystem(config)
+        sent = alerts.send_email("Test", "<p>test</p>")
+        alerts.close()
+    
+    assert sent is False
+    assert server.sendmail.call_count == 1
+    assert smtp_ssl.call_count == 1
+    print("✅ Permanent SMTP rejection not retried")
+
 if __name__ == "__main__":
     test_email_setup()
+    test_permanent_rejection_not_retried()
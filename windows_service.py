@@ -5,7 +5,6 @@ import servicemanager
 import socket
 import asyncio
 import sys
-import os
 from pathlib import Path
 
 # Add current directory to Python path
@@ -41,16 +40,7 @@ class FactorMonitoringService(win32serviceutil.ServiceFramework):
             # Load configuration
             load_dotenv('.env.production')
             
-            config = SystemConfig(
-                db_path=os.getenv('DB_PATH', 'factor_monitoring_production.db'),
-                email_sender=os.getenv('FACTOR_EMAIL'),
-                email_password=os.getenv('FACTOR_EMAIL_PASSWORD'),
-                email_recipients=os.getenv('FACTOR_RECIPIENTS', '').split(','),
-                tos_client_id=os.getenv('TOS_CLIENT_ID', ''),
-                tos_refresh_token=os.getenv('TOS_REFRESH_TOKEN', ''),
-                tos_account_id=os.getenv('TOS_ACCOUNT_ID', ''),
-                portfolio_value=float(os.getenv('PORTFOLIO_VALUE', 1000000))
-            )
+            config = SystemConfig.from_env(db_path='factor_monitoring_production.db')
             
             # Run the system
             asyncio.run(self.run_system(config))
@@ -62,10 +52,15 @@ class FactorMonitoringService(win32serviceutil.ServiceFramework):
         factor_system = CompleteFactorMonitoringSystem(config)
         await factor_system.start_system()
         
+        # Scheduled tasks run inside the monitoring loop
+        monitoring = asyncio.create_task(factor_system.run_monitoring_loop())
+        
         # Keep running until service stop
-        while win32event.WaitForSingleObject(self.hWaitStop, 1000) != win32event.WAIT_OBJECT_0:
-            # Process scheduled tasks
-            await asyncio.sleep(60)
+        while win32event.WaitForSingleObject(self.hWaitStop, 0) != win32event.WAIT_OBJECT_0:
+            await asyncio.sleep(5)
+        
+        factor_system.stop_monitoring()
+        await monitoring
 
 if __name__ == '__main__':
     win32serviceutil.HandleCommandLine(FactorMonitoringService)